@@ -33,6 +33,30 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def forbid_lazy_loads():
+    """Ленивая загрузка связанных объектов в цикле шаблона -- ошибка."""
+    from core import nplusone
+    nplusone.install()
+    yield
+    nplusone.uninstall()
+
+
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    """Миниатюры создаются сразу, а не в фоне после очистки MEDIA_ROOT."""
+    settings.THUMBNAIL_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def eager_tasks(settings):
+    """Фоновые задачи выполняются сразу: исполнителя в тестах нет."""
+    settings.TASKS_EAGER = True
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
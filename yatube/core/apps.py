@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Задачи core.tasks объявлены в модулях tasks приложений.
+        autodiscover_modules('tasks')
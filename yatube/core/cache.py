@@ -0,0 +1,225 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_VARIABLES = 900
+
+SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL,
+    accessed REAL NOT NULL, size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL, size INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_resize AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+END;
+-- Файл, созданный до cache_stats, считается один раз.
+INSERT OR IGNORE INTO cache_stats
+SELECT 0, COUNT(*), TOTAL(size) FROM cache;
+COMMIT;
+"""
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для процессов одной машины.
+
+    Записи вытесняются по давности последнего чтения, когда их больше
+    MAX_ENTRIES или суммарный размер превышает OPTIONS['MAX_SIZE'] байт.
+    Число записей и их размер триггеры ведут в строке cache_stats, и
+    запись в кэш не пересчитывает всю таблицу.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._max_size = params.get('OPTIONS', {}).get('MAX_SIZE')
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self._path, timeout=30,
+                                 isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            # Иначе INSERT OR REPLACE удаляет старую запись мимо триггера.
+            db.execute('PRAGMA recursive_triggers=ON')
+            db.executescript(SCHEMA)
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _write(self):
+        return _Transaction(self._db)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, keys):
+        now = time.time()
+        rows = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            marks = ','.join('?' * len(chunk))
+            rows.update(self._db.execute(
+                f'SELECT key, value FROM cache WHERE key IN ({marks}) '
+                'AND (expires IS NULL OR expires > ?)', (*chunk, now)
+            ))
+            if rows:
+                # Отметку о чтении обновляем не чаще раза в секунду.
+                self._db.execute(
+                    f'UPDATE cache SET accessed = ? WHERE key IN ({marks}) '
+                    'AND accessed < ?', (now, *chunk, now - 1)
+                )
+        return {key: pickle.loads(value) for key, value in rows.items()}
+
+    def _store(self, db, items, timeout, mode='REPLACE'):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in items:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            rows.append((key, value, expires, now, len(value)))
+        db.execute('DELETE FROM cache WHERE key IN ({}) AND expires <= ?'
+                   .format(','.join('?' * len(rows))),
+                   (*(row[0] for row in rows), now))
+        cursor = db.executemany(
+            f'INSERT OR {mode} INTO cache '
+            '(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+            rows,
+        )
+        self._cull(db, now)
+        return cursor.rowcount
+
+    def _cull(self, db, now):
+        count, size = db.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        over_size = self._max_size is not None and size > self._max_size
+        if count <= self._max_entries and not over_size:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY accessed LIMIT ?)',
+            (max(count // self._cull_frequency, 1),),
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            return self._store(db, [(key, value)], timeout, 'IGNORE') > 0
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            self._store(db, [(key, value)], timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            return db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?', (data, len(data), now, key)
+            )
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {keys[key]: value
+                for key, value in self._fetch(list(keys)).items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._key(key, version), value)
+                 for key, value in data.items()]
+        with self._write() as db:
+            for start in range(0, len(items), MAX_VARIABLES):
+                self._store(db, items[start:start + MAX_VARIABLES], timeout)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as db:
+            for start in range(0, len(keys), MAX_VARIABLES):
+                chunk = keys[start:start + MAX_VARIABLES]
+                db.execute('DELETE FROM cache WHERE key IN ({})'.format(
+                    ','.join('?' * len(chunk))), chunk)
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединения живут всё время работы процесса.
+        pass
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE: запись сразу блокирует остальных писателей."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
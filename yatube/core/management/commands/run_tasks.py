@@ -0,0 +1,52 @@
+import json
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Исполнитель фоновых задач из очереди в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.TASKS_BATCH_SIZE,
+                            help='Сколько задач забирать за раз')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.TASKS_POLL_INTERVAL,
+                            help='Пауза между опросами пустой очереди')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--metrics', action='store_true',
+                            help='Вывести состояние очереди и выйти')
+        parser.add_argument(
+            '--purge', type=int, metavar='SECONDS',
+            help='Удалить выполненные задачи старше SECONDS и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics']:
+            self.write_json(tasks.queue_metrics())
+            return
+        if options['purge'] is not None:
+            deleted = tasks.purge(options['purge'])
+            self.stdout.write(f'Удалено задач: {deleted}')
+            return
+        stats = tasks.WorkerStats()
+        # По SIGTERM исполнитель дописывает статистику и выходит.
+        signal.signal(signal.SIGTERM, self.terminate)
+        try:
+            tasks.work(options['batch_size'], options['once'],
+                       options['poll_interval'], stats)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.write_json(stats.as_dict())
+
+    def terminate(self, signum, frame):
+        raise KeyboardInterrupt
+
+    def write_json(self, data):
+        self.stdout.write(json.dumps(data, ensure_ascii=False, indent=2))
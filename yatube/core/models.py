@@ -6,6 +6,52 @@ class Pub_dateModel(models.Model):
         'Дата',
         auto_now_add=True
     )
+    # Меняется при каждом save(); версия записи для ключей кэша.
+    modified = models.DateTimeField(
+        'Изменено',
+        auto_now=True
+    )
 
     class Meta:
         abstract = True
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.TextField('Аргументы в JSON', default='{}')
+    key = models.CharField(
+        'Ключ идемпотентности', max_length=200, unique=True, null=True,
+        blank=True,
+    )
+    status = models.CharField('Состояние', max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить не раньше')
+    claim = models.CharField('Метка исполнителя', max_length=32, blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+    error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        # Исполнитель выбирает задачи из очереди по (status, run_at).
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.get_status_display()})'
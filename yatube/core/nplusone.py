@@ -0,0 +1,117 @@
+"""Проверка N+1 для тестов: ленивая загрузка связанных объектов
+в цикле шаблона падает с LazyLoadError.
+
+Ленивой считается выборка, которую Django делает от имени конкретного
+объекта: post.author без select_related, author.posts.count и т. п.
+Одна такая выборка за рендеринг допустима, вторая для другого объекта
+той же модели -- уже цикл.
+"""
+import functools
+import threading
+
+from django.db.models.query import QuerySet
+from django.template.base import Template
+from django.test.runner import DiscoverRunner
+
+_state = threading.local()
+_originals = {}
+
+
+class LazyLoadError(AssertionError):
+    pass
+
+
+def _check(queryset):
+    if not getattr(_state, 'depth', 0) or getattr(_state, 'prefetching', 0):
+        return
+    instance = queryset._hints.get('instance')
+    if instance is None:
+        return
+    key = (type(instance), queryset.model)
+    loaded = _state.loaded.setdefault(key, set())
+    loaded.add(instance.pk)
+    if len(loaded) > 1:
+        raise LazyLoadError(
+            f'{type(instance).__name__} лениво загружает '
+            f'{queryset.model.__name__} в цикле шаблона; добавьте '
+            'select_related или prefetch_related во view'
+        )
+
+
+def _wrap(cls, name, wrapper):
+    original = getattr(cls, name)
+    _originals[cls, name] = original
+    setattr(cls, name, functools.wraps(original)(wrapper(original)))
+
+
+def _render(original):
+    def render(self, context):
+        depth = getattr(_state, 'depth', 0)
+        if not depth:
+            _state.loaded = {}
+        _state.depth = depth + 1
+        try:
+            return original(self, context)
+        finally:
+            _state.depth = depth
+    return render
+
+
+def _prefetch(original):
+    def prefetch(self):
+        _state.prefetching = getattr(_state, 'prefetching', 0) + 1
+        try:
+            return original(self)
+        finally:
+            _state.prefetching -= 1
+    return prefetch
+
+
+def _fetch_all(original):
+    def fetch_all(self):
+        if self._result_cache is None:
+            _check(self)
+        return original(self)
+    return fetch_all
+
+
+def _query(original):
+    def query(self, *args, **kwargs):
+        if self._result_cache is None:
+            _check(self)
+        return original(self, *args, **kwargs)
+    return query
+
+
+def installed():
+    return bool(_originals)
+
+
+def install():
+    """Включает проверку во всём процессе; повторный вызов ничего
+    не делает."""
+    if installed():
+        return
+    _wrap(Template, 'render', _render)
+    _wrap(QuerySet, '_prefetch_related_objects', _prefetch)
+    _wrap(QuerySet, '_fetch_all', _fetch_all)
+    _wrap(QuerySet, 'count', _query)
+    _wrap(QuerySet, 'exists', _query)
+
+
+def uninstall():
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """Тестовый раннер, в котором включена проверка N+1."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        install()
+
+    def teardown_test_environment(self, **kwargs):
+        uninstall()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,210 @@
+import atexit
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_MISSING = object()
+
+
+class RequestProfile:
+    """Замеры одного запроса; служит и обёрткой выполнения SQL."""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+            self.queries[sql] += 1
+
+    def duplicates(self, threshold):
+        """Запросы, повторённые с разными параметрами не меньше
+        threshold раз: обычно это N+1 в цикле шаблона."""
+        return {sql: count for sql, count in self.queries.items()
+                if count >= threshold}
+
+
+def _current():
+    return getattr(_local, 'profile', None)
+
+
+def _instrument_templates():
+    render = Template.render
+    if getattr(render, 'profiled', False):
+        return
+
+    @functools.wraps(render)
+    def profiled_render(self, context):
+        profile = _current()
+        if profile is None or profile.template_depth:
+            # Вложенные {% include %} уже внутри замера внешнего шаблона.
+            return render(self, context)
+        profile.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.template_time += time.perf_counter() - start
+            profile.template_depth -= 1
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def _count_cache(hits, misses):
+    profile = _current()
+    if profile is not None:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+
+
+def _instrument_cache(cache_class):
+    get = cache_class.get
+    if getattr(get, 'profiled', False):
+        return
+
+    @functools.wraps(get)
+    def profiled_get(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        hit = value is not _MISSING
+        _count_cache(int(hit), int(not hit))
+        return value if hit else default
+
+    profiled_get.profiled = True
+    cache_class.get = profiled_get
+    get_many = cache_class.get_many
+    if get_many is BaseCache.get_many:
+        # Базовый get_many вызывает get, который уже считается.
+        return
+
+    @functools.wraps(get_many)
+    def profiled_get_many(self, keys, version=None):
+        keys = list(keys)
+        values = get_many(self, keys, version)
+        _count_cache(len(values), len(keys) - len(values))
+        return values
+
+    cache_class.get_many = profiled_get_many
+
+
+class Aggregator:
+    """Копит замеры по представлениям и периодически сбрасывает их
+    в PROFILING_FILE строками JSON или в лог."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.last_flush = time.monotonic()
+
+    def add(self, view_name, profile, total_time):
+        duplicates = profile.duplicates(
+            settings.PROFILING_DUPLICATE_THRESHOLD
+        )
+        with self.lock:
+            stats = self.stats.setdefault(
+                view_name, {'totals': Counter(), 'duplicates': {}}
+            )
+            stats['totals'].update({
+                'requests': 1,
+                'sql_count': profile.sql_count,
+                'sql_time': profile.sql_time,
+                'template_time': profile.template_time,
+                'cache_hits': profile.cache_hits,
+                'cache_misses': profile.cache_misses,
+                'total_time': total_time,
+            })
+            for sql, count in duplicates.items():
+                stats['duplicates'][sql] = max(
+                    count, stats['duplicates'].get(sql, 0)
+                )
+            due = (time.monotonic() - self.last_flush
+                   >= settings.PROFILING_FLUSH_INTERVAL)
+        if duplicates:
+            logger.warning('%s: повторяющиеся запросы %s', view_name,
+                           duplicates)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            stats, self.stats = self.stats, {}
+            self.last_flush = time.monotonic()
+        records = []
+        for view_name, data in sorted(stats.items()):
+            totals = data['totals']
+            requests = totals.pop('requests')
+            record = {'view': view_name, 'requests': requests}
+            for name, value in sorted(totals.items()):
+                record[f'avg_{name}'] = round(value / requests, 6)
+            record['duplicates'] = data['duplicates']
+            records.append(record)
+        if not records:
+            return records
+        if settings.PROFILING_FILE:
+            with open(settings.PROFILING_FILE, 'a') as output:
+                for record in records:
+                    output.write(json.dumps(record, ensure_ascii=False))
+                    output.write('\n')
+        else:
+            for record in records:
+                logger.info('%s', json.dumps(record, ensure_ascii=False))
+        return records
+
+
+aggregator = Aggregator()
+atexit.register(aggregator.flush)
+
+
+class ProfilingMiddleware:
+    """Замеряет долю PROFILING_SAMPLE_RATE запросов: SQL, шаблоны, кэш
+    и общее время по request.resolver_match.view_name."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _instrument_templates()
+        for alias in settings.CACHES:
+            _instrument_cache(type(caches[alias]))
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = _local.profile = RequestProfile()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        match = request.resolver_match
+        aggregator.add(match.view_name if match else '<unresolved>',
+                       profile, time.perf_counter() - start)
+        return response
@@ -0,0 +1,255 @@
+"""Фоновые задачи с очередью в БД.
+
+Задача регистрируется декоратором @task, ставится в очередь enqueue()
+и выполняется командой run_tasks. enqueue() пишет в ту транзакцию,
+которая открыта в момент вызова: bulk_follow/bulk_unfollow ставят
+задачу вместе со своей записью, а обработчики сигналов представлений,
+работающих в автокоммите, -- отдельным запросом сразу после записи.
+Неудачная попытка повторяется с растущей паузой, ключ идемпотентности
+не даёт поставить одну работу дважды, а задачи с batch=True получают
+сразу пачку аргументов. Результат записывает только исполнитель,
+который всё ещё владеет задачей (claim).
+
+При TASKS_EAGER задачи выполняются сразу в enqueue(): так работают
+тесты, где исполнителя нет.
+"""
+import functools
+import json
+import logging
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class TaskSpec:
+    def __init__(self, name, func, max_attempts, batch):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.batch = batch
+
+
+def task(func=None, *, name=None, max_attempts=None, batch=False):
+    """Регистрирует функцию как задачу app.function.
+
+    Обычная задача вызывается как func(**payload), задача с batch=True
+    -- как func(payloads) со списком аргументов всех задач пачки.
+    У функции появляется метод enqueue(payload=None, key=None, delay=0).
+    """
+    def decorator(func):
+        spec = TaskSpec(
+            name or f'{func.__module__.split(".")[0]}.{func.__name__}',
+            func,
+            max_attempts or settings.TASKS_MAX_ATTEMPTS,
+            batch,
+        )
+        _registry[spec.name] = spec
+        func.task_name = spec.name
+        func.enqueue = functools.partial(enqueue, spec.name)
+        return func
+    return decorator if func is None else decorator(func)
+
+
+def _call(spec, payloads):
+    if spec.batch:
+        spec.func(payloads)
+    else:
+        for payload in payloads:
+            spec.func(**payload)
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """Ставит задачу в очередь; с ключом key -- не больше одного раза,
+    пока запись о задаче не удалена из очереди."""
+    spec = _registry[name]
+    payload = payload or {}
+    if settings.TASKS_EAGER:
+        _call(spec, [payload])
+        return
+    Task.objects.bulk_create([Task(
+        name=name,
+        payload=json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True),
+        key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+class WorkerStats:
+    """Счётчики исполнителя по задачам с момента запуска."""
+
+    def __init__(self):
+        self.done = Counter()
+        self.retried = Counter()
+        self.failed = Counter()
+        self.seconds = Counter()
+
+    def as_dict(self):
+        return {
+            name: {
+                'done': self.done[name],
+                'retried': self.retried[name],
+                'failed': self.failed[name],
+                'avg_ms': round(
+                    self.seconds[name] * 1000
+                    / max(1, self.done[name] + self.retried[name]
+                          + self.failed[name]), 3
+                ),
+            }
+            for name in sorted(set(self.done) | set(self.retried)
+                               | set(self.failed))
+        }
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи исполнителей, которые упали, не
+    дойдя до конца."""
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    return Task.objects.filter(
+        status=Task.RUNNING, started__lt=deadline,
+    ).update(status=Task.PENDING, claim='')
+
+
+def claim(limit):
+    """Забирает до limit готовых задач; задачу получает только один
+    исполнитель, даже если они опрашивают очередь одновременно."""
+    now = timezone.now()
+    ids = list(Task.objects.filter(
+        status=Task.PENDING, run_at__lte=now,
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Task.objects.filter(pk__in=ids, status=Task.PENDING).update(
+        status=Task.RUNNING, claim=token, started=now,
+    )
+    return list(Task.objects.filter(claim=token).order_by('run_at', 'pk'))
+
+
+def _retry_delay(attempts):
+    return settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def _fail(tasks, spec, error, stats):
+    now = timezone.now()
+    # Задачи, которые requeue_stale уже отдал другому исполнителю, не
+    # трогаем: их результат запишет новый владелец.
+    owned = set(Task.objects.filter(
+        pk__in=[item.pk for item in tasks], claim=tasks[0].claim,
+    ).values_list('pk', flat=True))
+    tasks = [item for item in tasks if item.pk in owned]
+    for item in tasks:
+        item.attempts += 1
+        item.error = error
+        item.claim = ''
+        if item.attempts >= spec.max_attempts:
+            item.status = Task.FAILED
+            item.finished = now
+            stats.failed[item.name] += 1
+        else:
+            item.status = Task.PENDING
+            item.run_at = now + timedelta(seconds=_retry_delay(item.attempts))
+            stats.retried[item.name] += 1
+    Task.objects.bulk_update(
+        tasks, ['attempts', 'error', 'claim', 'status', 'finished', 'run_at']
+    )
+
+
+def _groups(tasks):
+    """Пачки задач: задачи с batch=True одного имени вместе, остальные
+    по одной, чтобы ошибка одной не откатывала соседние."""
+    batches = {}
+    for item in tasks:
+        spec = _registry.get(item.name)
+        if spec is not None and spec.batch:
+            batches.setdefault(item.name, []).append(item)
+        else:
+            yield [item]
+    yield from batches.values()
+
+
+def run(tasks, stats):
+    """Выполняет забранные задачи и записывает результат."""
+    for group in _groups(tasks):
+        name = group[0].name
+        spec = _registry.get(name)
+        if spec is None:
+            _fail(group, TaskSpec(name, None, 1, False),
+                  f'Задача {name} не зарегистрирована', stats)
+            continue
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                _call(spec, [json.loads(item.payload) for item in group])
+        except Exception as error:
+            logger.exception('Задача %s не выполнена', name)
+            stats.seconds[name] += time.perf_counter() - start
+            _fail(group, spec, f'{type(error).__name__}: {error}', stats)
+            continue
+        stats.seconds[name] += time.perf_counter() - start
+        stats.done[name] += len(group)
+        Task.objects.filter(
+            pk__in=[item.pk for item in group], claim=group[0].claim,
+        ).update(status=Task.DONE, finished=timezone.now(), claim='')
+
+
+def work(batch_size=None, once=False, poll_interval=None, stats=None):
+    """Цикл исполнителя; с once=True -- до опустошения очереди.
+
+    Возвращает WorkerStats.
+    """
+    batch_size = batch_size or settings.TASKS_BATCH_SIZE
+    poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+    stats = stats or WorkerStats()
+    while True:
+        requeue_stale()
+        tasks = claim(batch_size)
+        if tasks:
+            run(tasks, stats)
+        close_old_connections()
+        if not tasks:
+            if once:
+                return stats
+            time.sleep(poll_interval)
+
+
+def queue_metrics():
+    """Глубина очереди по задачам и состояниям и возраст самой старой
+    готовой к выполнению задачи в секундах."""
+    rows = Task.objects.order_by().values_list('name', 'status').annotate(
+        total=Count('pk')
+    )
+    queue = {}
+    for name, status, total in rows:
+        queue.setdefault(name, dict.fromkeys(
+            (value for value, _ in Task.STATUSES), 0
+        ))[status] = total
+    oldest = Task.objects.filter(
+        status=Task.PENDING, run_at__lte=timezone.now(),
+    ).aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        'queue': queue,
+        'oldest_pending_s': (round((timezone.now() - oldest).total_seconds(),
+                                   3) if oldest else 0),
+    }
+
+
+def purge(older_than):
+    """Удаляет выполненные задачи старше older_than секунд; их ключи
+    идемпотентности освобождаются."""
+    deadline = timezone.now() - timedelta(seconds=older_than)
+    return Task.objects.filter(
+        status=Task.DONE, finished__lt=deadline,
+    ).delete()[0]
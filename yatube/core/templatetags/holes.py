@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+HOLE_MARK = '<!--hole:{}-->'
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """Фрагмент страницы, свой у каждого пользователя.
+
+    В общем каркасе страницы (punch_holes в контексте) на его месте
+    остаётся метка, которую заполняет posts.page_cache; иначе
+    фрагмент подключается как {% include %}.
+    """
+    if context.get('punch_holes'):
+        return mark_safe(HOLE_MARK.format(template_name))
+    return context.template.engine.get_template(template_name).render(
+        context
+    )
@@ -0,0 +1,18 @@
+from django import template
+from django.urls import reverse
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def memo_url(context, viewname, *args):
+    """{% url %}, который разрешает одинаковые адреса один раз за рендер:
+    у карточек одной страницы часто общие автор и сообщество."""
+    urls = context.render_context.get(memo_url)
+    if urls is None:
+        urls = context.render_context[memo_url] = {}
+    # reverse() всё равно приводит аргументы к строке.
+    key = (viewname, *map(str, args))
+    if key not in urls:
+        urls[key] = reverse(viewname, args=args)
+    return urls[key]
@@ -0,0 +1,46 @@
+"""Общие помощники тестов."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+
+from core.nplusone import NPlusOneTestRunner
+
+
+class OnCommitMixin:
+    """captureOnCommitCallbacks из Django 3.2 для TestCase.
+
+    TestCase не фиксирует транзакцию, и колбэки transaction.on_commit
+    в нём не выполняются. Менеджер собирает колбэки, зарегистрированные
+    внутри блока, и с execute=True выполняет их, как после фиксации.
+    """
+
+    @classmethod
+    @contextmanager
+    def captureOnCommitCallbacks(cls, *, using=DEFAULT_DB_ALIAS,
+                                 execute=False):
+        callbacks = []
+        start = len(connections[using].run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            callbacks[:] = [
+                func for _, func in connections[using].run_on_commit[start:]
+            ]
+            if execute:
+                for callback in callbacks:
+                    callback()
+
+
+class TestRunner(NPlusOneTestRunner):
+    """Раннер тестов проекта: к проверке N+1 добавляет немедленное
+    выполнение фоновых задач -- исполнителя run_tasks в тестах нет."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._eager_tasks = override_settings(TASKS_EAGER=True)
+        self._eager_tasks.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._eager_tasks.disable()
+        super().teardown_test_environment(**kwargs)
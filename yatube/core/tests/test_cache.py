@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from multiprocessing import get_context
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def _incr_in_process(path):
+    cache = SQLiteCache(path, {})
+    for _ in range(50):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_shared_between_instances(self):
+        """Ошибка общего доступа к записям кэша"""
+        self.cache.set('key', {'value': 1})
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertFalse(other.add('key', 2))
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_entries(self):
+        """Ошибка истечения срока записей"""
+        self.cache.set('key', 'value', 0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_get_many_set_many(self):
+        """Ошибка пакетного чтения и записи"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 2000}})
+        data = {f'key{number}': number for number in range(1000)}
+        self.assertEqual(cache.set_many(data), [])
+        self.assertEqual(cache.get_many([*data, 'missing']), data)
+        cache.delete_many(data)
+        self.assertEqual(cache.get_many(data), {})
+
+    def test_incr_is_atomic_across_processes(self):
+        """Ошибка атомарного incr в нескольких процессах"""
+        self.cache.set('counter', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        context = get_context('spawn')
+        processes = [context.Process(target=_incr_in_process,
+                                     args=(self.path,)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 150)
+
+    def test_lru_eviction(self):
+        """Ошибка вытеснения давно прочитанных записей"""
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2},
+        })
+        for number in range(4):
+            cache.set(f'key{number}', number)
+        cache._db.execute('UPDATE cache SET accessed = 0')
+        cache._db.execute(
+            "UPDATE cache SET accessed = 1 WHERE key LIKE '%key0'"
+        )
+        cache.get('key0')
+        cache.set('key4', 4)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertEqual(cache.get('key4'), 4)
+        self.assertEqual(len(cache.get_many(
+            [f'key{number}' for number in range(5)]
+        )), 3)
+
+    def test_size_bound(self):
+        """Ошибка ограничения суммарного размера"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_SIZE': 2000}})
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 500)
+        total = cache._db.execute('SELECT TOTAL(size) FROM cache').fetchone()
+        self.assertLessEqual(total[0], 2000 + 600)
+
+    def test_stats(self):
+        """Ошибка учёта числа и размера записей в cache_stats"""
+        def check():
+            self.assertEqual(
+                db.execute('SELECT entries, size FROM cache_stats')
+                .fetchone(),
+                db.execute('SELECT COUNT(*), TOTAL(size) FROM cache')
+                .fetchone(),
+            )
+
+        db = self.cache._db
+        self.cache.set_many({'key': 'x' * 100, 'counter': 1, 'other': 2})
+        self.cache.set('key', 'x' * 10)
+        self.cache.add('key', 'x' * 50)
+        self.cache.incr('counter', 10 ** 30)
+        self.cache.delete('other')
+        check()
+        self.assertEqual(db.execute('SELECT entries FROM cache_stats')
+                         .fetchone(), (2,))
+        # Файл, в котором записи появились раньше cache_stats.
+        db.executescript(
+            'DROP TRIGGER cache_insert; DROP TRIGGER cache_delete; '
+            'DROP TRIGGER cache_resize; DROP TABLE cache_stats;'
+        )
+        db.execute("INSERT INTO cache VALUES ('new', x'00', NULL, 0, 20)")
+        cache = SQLiteCache(self.path, {})
+        db = cache._db
+        check()
+        cache.clear()
+        check()
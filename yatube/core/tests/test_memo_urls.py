@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.template import Context, Engine
+from django.test import TestCase
+
+from core.templatetags import memo_urls
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class MemoUrlTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Группа', slug='slug')
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {number}')
+            for number in range(3)
+        )
+        cls.posts = list(Post.objects.select_related('author', 'group'))
+        cls.engine = Engine.get_default()
+
+    def render(self, source, **context):
+        return self.engine.from_string(source).render(Context(context))
+
+    def test_memo_url(self):
+        """Ошибка разрешения адреса один раз за рендер"""
+        source = ('{% load memo_urls %}{% for post in page_obj %}'
+                  "{% memo_url 'posts:profile' post.author %} "
+                  '{% endfor %}')
+        with mock.patch.object(memo_urls, 'reverse',
+                               wraps=memo_urls.reverse) as reverse:
+            output = self.render(source, page_obj=self.posts)
+            self.render(source, page_obj=self.posts)
+        self.assertEqual(output.split(), ['/profile/auth/'] * 3)
+        self.assertEqual(reverse.call_count, 2)
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import TestCase
+
+from core import nplusone
+from posts.models import Group, Post
+
+User = get_user_model()
+
+CARDS = Template(
+    '{% for post in posts %}{{ post.author.username }} '
+    '{{ post.group.slug }}{% endfor %}'
+)
+
+
+class NPlusOneTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Под NPlusOneTestRunner проверка уже включена и должна остаться
+        # включённой; иначе она снимается после этих тестов.
+        if not nplusone.installed():
+            nplusone.install()
+            cls.addClassCleanup(nplusone.uninstall)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        for number in range(3):
+            author = User.objects.create_user(username=f'auth{number}')
+            Post.objects.create(author=author, group=cls.group,
+                                text='Тестовый пост')
+
+    def test_lazy_load_in_loop(self):
+        """Ошибка обнаружения ленивой загрузки в цикле шаблона"""
+        with self.assertRaises(nplusone.LazyLoadError):
+            CARDS.render(Context({'posts': Post.objects.all()}))
+
+    def test_reverse_manager_in_loop(self):
+        """Ошибка обнаружения запроса менеджера в цикле шаблона"""
+        template = Template(
+            '{% for author in authors %}{{ author.posts.count }}{% endfor %}'
+        )
+        with self.assertRaises(nplusone.LazyLoadError):
+            template.render(Context({'authors': User.objects.all()}))
+
+    def test_allowed_loads(self):
+        """Ложное срабатывание проверки N+1"""
+        posts = Post.objects.select_related('author', 'group')
+        CARDS.render(Context({'posts': posts}))
+        CARDS.render(Context({'posts': Post.objects.all()[:1]}))
+        CARDS.render(Context({
+            'posts': Post.objects.prefetch_related('author', 'group'),
+        }))
+        for post in Post.objects.all():
+            post.author
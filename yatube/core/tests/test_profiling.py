@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        profiling.aggregator.flush()
+        descriptor, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(descriptor)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def records(self):
+        with override_settings(PROFILING_FILE=self.path):
+            profiling.aggregator.flush()
+        with open(self.path) as output:
+            return {record['view']: record
+                    for record in map(json.loads, output)}
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_views_are_profiled(self):
+        """Ошибка сбора замеров по представлениям"""
+        client = Client()
+        client.get(reverse('posts:index'))
+        client.get(reverse('posts:index'))
+        client.get(reverse('posts:post_detail', args=(self.post.pk,)))
+        records = self.records()
+        self.assertEqual(set(records), {'posts:index', 'posts:post_detail'})
+        index = records['posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['avg_sql_count'], 0)
+        self.assertGreater(index['avg_template_time'], 0)
+        self.assertGreaterEqual(index['avg_total_time'],
+                                index['avg_template_time'])
+        # Первый запрос промахивается мимо кэша ленты, второй попадает.
+        self.assertGreater(index['avg_cache_hits'], 0)
+        self.assertGreater(index['avg_cache_misses'], 0)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.000001)
+    def test_sampling(self):
+        """Ошибка выборочного профилирования"""
+        Client().get(reverse('posts:index'))
+        with override_settings(PROFILING_FILE=self.path):
+            self.assertEqual(profiling.aggregator.flush(), [])
+
+    def test_duplicates(self):
+        """Ошибка поиска повторяющихся запросов"""
+        profile = profiling.RequestProfile()
+        with connection.execute_wrapper(profile):
+            for _ in range(3):
+                Post.objects.filter(pk=self.post.pk).exists()
+            User.objects.filter(pk=self.user.pk).exists()
+        duplicates = profile.duplicates(3)
+        self.assertEqual(list(duplicates.values()), [3])
+        self.assertIn('posts_post', next(iter(duplicates)))
@@ -0,0 +1,178 @@
+import io
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+from posts.models import FeedItem, Follow, Post
+from posts.search import search_posts
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(name='tests.record_batch', batch=True)
+def record_batch(payloads):
+    calls.append([payload['value'] for payload in payloads])
+
+
+@tasks.task(name='tests.broken', max_attempts=2)
+def broken():
+    raise RuntimeError('сбой')
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_work(self):
+        """Ошибка постановки в очередь и выполнения задачи"""
+        record.enqueue({'value': 1})
+        self.assertEqual(calls, [])
+        stats = tasks.work(once=True)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertEqual(stats.as_dict()['tests.record']['done'], 1)
+
+    def test_idempotency_key(self):
+        """Ошибка ключа идемпотентности"""
+        for _ in range(3):
+            record.enqueue({'value': 1}, key='record:1')
+        tasks.work(once=True)
+        record.enqueue({'value': 1}, key='record:1')
+        tasks.work(once=True)
+        self.assertEqual(calls, [1])
+        Task.objects.update(finished=timezone.now() - timedelta(hours=1))
+        self.assertEqual(tasks.purge(60), 1)
+        record.enqueue({'value': 1}, key='record:1')
+        tasks.work(once=True)
+        self.assertEqual(calls, [1, 1])
+
+    def test_batch(self):
+        """Ошибка пакетного выполнения задач"""
+        for value in range(3):
+            record_batch.enqueue({'value': value})
+        record.enqueue({'value': 'single'})
+        tasks.work(once=True)
+        self.assertEqual(calls, ['single', [0, 1, 2]])
+
+    def test_retries(self):
+        """Ошибка повтора неудачной задачи"""
+        broken.enqueue()
+        stats = tasks.work(once=True)
+        item = Task.objects.get()
+        self.assertEqual(item.status, Task.PENDING)
+        self.assertEqual(item.attempts, 1)
+        self.assertIn('RuntimeError: сбой', item.error)
+        self.assertGreater(item.run_at, timezone.now())
+        Task.objects.update(run_at=timezone.now())
+        tasks.work(once=True, stats=stats)
+        item.refresh_from_db()
+        self.assertEqual(item.status, Task.FAILED)
+        counters = stats.as_dict()['tests.broken']
+        self.assertEqual(
+            (counters['done'], counters['retried'], counters['failed']),
+            (0, 1, 1),
+        )
+
+    def test_claim(self):
+        """Ошибка выдачи задачи одному исполнителю"""
+        record.enqueue({'value': 1})
+        self.assertEqual(len(tasks.claim(10)), 1)
+        self.assertEqual(tasks.claim(10), [])
+        Task.objects.update(started=timezone.now() - timedelta(days=1))
+        self.assertEqual(tasks.requeue_stale(), 1)
+        self.assertEqual(len(tasks.claim(10)), 1)
+
+    def test_stale_worker(self):
+        """Ошибка записи результата исполнителем, у которого забрали
+        задачу"""
+        record.enqueue({'value': 1})
+        broken.enqueue()
+        stale = tasks.claim(10)
+        Task.objects.update(started=timezone.now() - timedelta(days=1))
+        tasks.requeue_stale()
+        fresh = tasks.claim(10)
+        tasks.run(stale, tasks.WorkerStats())
+        self.assertEqual(
+            set(Task.objects.values_list('status', 'attempts', 'claim')),
+            {(Task.RUNNING, 0, fresh[0].claim)},
+        )
+        tasks.run(fresh, tasks.WorkerStats())
+        self.assertEqual(
+            dict(Task.objects.values_list('name', 'status')),
+            {'tests.record': Task.DONE, 'tests.broken': Task.PENDING},
+        )
+
+    def test_metrics(self):
+        """Ошибка метрик очереди"""
+        record.enqueue({'value': 1})
+        record.enqueue({'value': 2}, delay=60)
+        metrics = tasks.queue_metrics()
+        self.assertEqual(metrics['queue']['tests.record'][Task.PENDING], 2)
+        self.assertGreaterEqual(metrics['oldest_pending_s'], 0)
+        output = io.StringIO()
+        call_command('run_tasks', '--once', stdout=output)
+        counters = json.loads(output.getvalue())['tests.record']
+        self.assertEqual((counters['done'], counters['failed']), (1, 0))
+        output = io.StringIO()
+        call_command('run_tasks', '--metrics', stdout=output)
+        queue = json.loads(output.getvalue())['queue']['tests.record']
+        self.assertEqual((queue[Task.DONE], queue[Task.PENDING]), (1, 1))
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """Ошибка немедленного выполнения задач"""
+        record.enqueue({'value': 1})
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_EAGER=False)
+class PostTasksTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_side_effects(self):
+        """Ошибка фоновой раскладки и индексации поста"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        tasks.work(once=True)
+        post = Post.objects.create(author=self.author, text='Фоновый пост')
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(search_posts('фоновый'), [])
+        self.assertEqual(
+            set(Task.objects.filter(status=Task.PENDING)
+                .values_list('name', flat=True)),
+            {'posts.fan_out_post', 'posts.index_posts'},
+        )
+        tasks.work(once=True)
+        self.assertTrue(FeedItem.objects.filter(user=self.reader,
+                                                post=post).exists())
+        self.assertEqual(search_posts('фоновый'), [post.pk])
+
+    def test_unfollow_before_task(self):
+        """Ошибка задачи подписки после отписки"""
+        Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        tasks.work(once=True)
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
@@ -0,0 +1,167 @@
+"""JSON API лент и постов.
+
+Ответы строятся теми же запросами, что и HTML-страницы (posts.feeds).
+ETag и Last-Modified считаются по версиям лент без обращения к БД
+за постами, поэтому неизменившаяся лента отдаёт 304 сразу.
+"""
+import json
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
+
+from .feed_cache import conditional
+from .feeds import (comments_page, feeds_for_follow, feeds_for_group,
+                    feeds_for_profile, follow_page, get_post, group_page,
+                    index_feeds, index_page, post_feeds, profile_page)
+from .follows import FOLLOW_BULK_LIMIT, bulk_follow, bulk_unfollow, resolve
+from .models import Group, User
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'thumbnail': lambda post: post.thumbnail.url if post.thumbnail else None,
+    'comments_count': lambda post: post.comments_count,
+}
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'pub_date': lambda comment: comment.pub_date.isoformat(),
+}
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _fields(request, available):
+    """Поля из ?fields=a,b; None, если запрошено неизвестное поле."""
+    names = request.GET.get('fields')
+    if not names:
+        return list(available)
+    names = names.split(',')
+    if any(name not in available for name in names):
+        return None
+    return names
+
+
+def _serialize(obj, fields, available):
+    return {name: available[name](obj) for name in fields}
+
+
+def _page_link(request, param, cursor):
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[param] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def _page_data(request, page, fields, available):
+    return {
+        'results': [_serialize(obj, fields, available) for obj in page],
+        'next': (_page_link(request, 'after', page.next_cursor)
+                 if page.has_next() else None),
+        'previous': (_page_link(request, 'before', page.previous_cursor)
+                     if page.has_previous() else None),
+    }
+
+
+def _feed_response(request, page_func, *args):
+    fields = _fields(request, POST_FIELDS)
+    if fields is None:
+        return _error(f'Доступные поля: {", ".join(POST_FIELDS)}')
+    page = page_func(request, *args, cursor_only=True)
+    return JsonResponse(_page_data(request, page, fields, POST_FIELDS))
+
+
+@conditional(lambda request: index_feeds())
+def index(request):
+    return _feed_response(request, index_page)
+
+
+@conditional(feeds_for_group)
+def group_posts(request, slug):
+    return _feed_response(request, group_page,
+                          get_object_or_404(Group, slug=slug))
+
+
+@conditional(feeds_for_profile)
+def profile(request, username):
+    return _feed_response(request, profile_page,
+                          get_object_or_404(User, username=username))
+
+
+@conditional(feeds_for_follow)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация', status=401)
+    return _feed_response(request, follow_page)
+
+
+@conditional(lambda request, post_id: post_feeds(post_id))
+def post_detail(request, post_id):
+    available = {**POST_FIELDS, 'comments': None}
+    fields = _fields(request, available)
+    if fields is None:
+        return _error(f'Доступные поля: {", ".join(available)}')
+    post = get_post(post_id)
+    data = _serialize(post, [name for name in fields if name != 'comments'],
+                      POST_FIELDS)
+    if 'comments' in fields:
+        data['comments'] = _page_data(
+            request, comments_page(request, post_id),
+            list(COMMENT_FIELDS), COMMENT_FIELDS,
+        )
+    return JsonResponse(data)
+
+
+def _usernames(data, name):
+    """Список имён из поля name тела запроса; None, если он не список
+    строк."""
+    usernames = data.get(name, [])
+    if (not isinstance(usernames, list)
+            or not all(isinstance(username, str) for username in usernames)):
+        return None
+    return usernames
+
+
+@require_POST
+def follow_bulk(request):
+    """Подписки и отписки пачкой: {"follow": [...], "unfollow": [...]}.
+
+    Имена разрешаются одним запросом, подписки пишутся одним INSERT,
+    отписки -- одним DELETE.
+    """
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация', status=401)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return _error('Тело запроса -- не JSON')
+    if not isinstance(data, dict):
+        return _error('Ожидается объект с полями follow и unfollow')
+    follow, unfollow = _usernames(data, 'follow'), _usernames(data, 'unfollow')
+    if follow is None or unfollow is None:
+        return _error('follow и unfollow -- списки имён')
+    if len(follow) + len(unfollow) > FOLLOW_BULK_LIMIT:
+        return _error(f'Не больше {FOLLOW_BULK_LIMIT} имён за запрос')
+    ids = resolve(follow + unfollow)
+    names = {pk: username for username, pk in ids.items()}
+    followed = bulk_follow(request.user, [
+        ids[username] for username in follow if username in ids
+    ])
+    unfollowed = bulk_unfollow(request.user, [
+        ids[username] for username in unfollow if username in ids
+    ])
+    return JsonResponse({
+        'followed': [names[pk] for pk in followed],
+        'unfollowed': [names[pk] for pk in unfollowed],
+        'unknown': sorted({username for username in follow + unfollow
+                           if username not in ids}),
+    })
@@ -0,0 +1,266 @@
+"""Замеры задержки, числа SQL-запросов и памяти для представлений posts.
+
+Данные засеваются пакетами через bulk_create, поэтому счётчики, ленты
+подписок и поисковый индекс после засева строятся отдельно.
+"""
+import functools
+import math
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Engine
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post
+from .utils import POSTS_OF_PAGE
+
+User = get_user_model()
+
+SEED_BATCH_SIZE = 5000
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+         'add_comment')
+# Запросов на представление, которые выполняются под tracemalloc.
+MEMORY_SAMPLES = 20
+# Лента из карточек постов: подключённых через include и взятых из кэша
+# карточек, как в шаблонах лент.
+CARD_TEMPLATES = {
+    'card_include': (
+        "{% for post in page_obj %}"
+        "{% include 'posts/includes/post_card.html' %}{% endfor %}"
+    ),
+    'card_cached': (
+        '{% load post_cards %}{% post_cards page_obj as cards %}'
+        '{% for card in cards %}{{ card }}{% endfor %}'
+    ),
+}
+
+# Свой кэш в памяти процесса: замеры чистят его перед запросами и не
+# должны трогать общий кэш из настроек, а ключи тестовой базы -- в него
+# попадать.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'posts-benchmark',
+    },
+}
+
+
+def isolated_cache(func):
+    """Выполняет func с кэшем BENCHMARK_CACHES вместо настроенного."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _batches(objects, size=SEED_BATCH_SIZE):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk(model, objects):
+    for batch in _batches(objects):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _follow_pairs(rng, user_ids, count):
+    count = min(count, len(user_ids) * (len(user_ids) - 1))
+    pairs = set()
+    while len(pairs) < count:
+        user_id, author_id = rng.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    return pairs
+
+
+@isolated_cache
+def seed(users, posts, comments, follows, groups=50, seed=0):
+    """Засевает базу пользователями, группами, постами и подписками."""
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    password = make_password(None)
+    _bulk(User, (User(username=f'{fake.user_name()}{number}',
+                      first_name=fake.first_name(),
+                      last_name=fake.last_name(), password=password)
+                 for number in range(users)))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    mixer.cycle(groups).blend(Group)
+    group_ids = [None, *Group.objects.values_list('pk', flat=True)]
+    _bulk(Post, (Post(author_id=rng.choice(user_ids),
+                      group_id=rng.choice(group_ids),
+                      text=fake.paragraph(nb_sentences=5))
+                 for _ in range(posts)))
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    _bulk(Comment, (Comment(post_id=rng.choice(post_ids),
+                            author_id=rng.choice(user_ids),
+                            text=fake.sentence())
+                    for _ in range(comments)))
+    _bulk(Follow, (Follow(user_id=user_id, author_id=author_id)
+                   for user_id, author_id
+                   in _follow_pairs(rng, user_ids, follows)))
+    # Счётчики подписчиков нужны раньше лент: посты популярных авторов
+    # fill_timeline не раскладывает.
+    counters.recount()
+    timeline.fill_timeline()
+    search.rebuild()
+
+
+def _targets(rng):
+    """Функции, которые выдают запрос (метод, адрес, данные) к каждому
+    представлению."""
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    usernames = list(User.objects.values_list('username', flat=True))
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    pages = max(1, min(50, len(post_ids) // 10))
+
+    def page():
+        return {'page': rng.randint(1, pages)}
+
+    return {
+        'index': lambda: ('get', reverse('posts:index'), page()),
+        'group_posts': lambda: ('get', reverse(
+            'posts:group_list', args=(rng.choice(slugs),)), None),
+        'profile': lambda: ('get', reverse(
+            'posts:profile', args=(rng.choice(usernames),)), None),
+        'post_detail': lambda: ('get', reverse(
+            'posts:post_detail', args=(rng.choice(post_ids),)), None),
+        'follow_index': lambda: ('get', reverse('posts:follow_index'),
+                                 page()),
+        'add_comment': lambda: ('post', reverse(
+            'posts:add_comment', args=(rng.choice(post_ids),)),
+            {'text': 'Комментарий для замера'}),
+    }
+
+
+def _reader():
+    """Клиент самого активного подписчика: у него самая длинная лента."""
+    reader = User.objects.order_by('-counters__following_count').first()
+    client = Client()
+    client.force_login(reader)
+    return client
+
+
+def _request(client, request):
+    method, url, data = request
+    response = getattr(client, method)(url, data)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url} ответил {response.status_code}')
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def _cold(target):
+    """Запрос к представлению с пустым кэшем: замеряется холодный путь.
+    Кэш чистится здесь, до начала замера."""
+    request = target()
+    cache.clear()
+    return request
+
+
+@isolated_cache
+def measure(requests=100, seed=0, views=VIEWS):
+    """Метрики каждого представления: p50/p99 в мс, максимум SQL-запросов
+    на запрос и пиковая память в КиБ."""
+    rng = random.Random(seed)
+    client = _reader()
+    targets = _targets(rng)
+    results = {}
+    for view in views:
+        target = targets[view]
+        _request(client, _cold(target))
+        timings = []
+        for _ in range(requests):
+            request = _cold(target)
+            start = time.perf_counter()
+            _request(client, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(min(requests, MEMORY_SAMPLES)):
+                request = _cold(target)
+                tracemalloc.reset_peak()
+                with CaptureQueriesContext(connection) as context:
+                    _request(client, request)
+                queries = max(queries, len(context.captured_queries))
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        results[view] = {
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': queries,
+            'peak_kib': round(peak / 1024, 1),
+        }
+    return results
+
+
+@isolated_cache
+def measure_cards(repeats=200, cards=POSTS_OF_PAGE):
+    """Время рендера одной карточки поста в мкс, p50 и p99, для каждого
+    варианта CARD_TEMPLATES.
+
+    Шаблон компилируется один раз, как с кэширующим загрузчиком, а посты
+    загружены заранее: замеряется только рендер. Кэш карточек заполняет
+    первый рендер, который не замеряется.
+    """
+    posts = list(Post.objects.select_related('author', 'group')
+                 .order_by('-pub_date', '-pk')[:cards])
+    if not posts:
+        raise ValueError('Для замера карточек нужны посты')
+    engine = Engine.get_default()
+    results = {}
+    for name, source in CARD_TEMPLATES.items():
+        template = engine.from_string(source)
+        template.render(Context({'page_obj': posts}))
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            template.render(Context({'page_obj': posts}))
+            timings.append(
+                (time.perf_counter() - start) * 1000000 / len(posts)
+            )
+        results[name] = {
+            'p50_us': round(percentile(timings, 0.5), 3),
+            'p99_us': round(percentile(timings, 0.99), 3),
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Регрессии относительно baseline.
+
+    Время и память могут вырасти не более чем в 1 + threshold раз,
+    число запросов не должно расти вовсе.
+    """
+    regressions = []
+    for view, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(view, {}).get(metric)
+            if old is None:
+                continue
+            limit = old if metric == 'queries' else old * (1 + threshold)
+            if value > limit:
+                regressions.append(f'{view}.{metric}: {old} -> {value}')
+    return regressions
@@ -0,0 +1,61 @@
+"""Кэш HTML карточек постов.
+
+Карточка одного поста одинакова во всех лентах, где он показан, и
+отличается только вариантом: в профиле вместо ссылки на автора его
+имя, в группе нет ссылки на группу. Ключ карточки содержит время
+изменения поста, готовность миниатюры и подписи автора и сообщества,
+поэтому правка поста, картинки или переименование автора и сообщества
+сами выводят старую карточку из употребления.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_CACHE_TIMEOUT = settings.CARD_CACHE_TIMEOUT
+
+
+def card_variant(context):
+    if context.get('author'):
+        return 'profile'
+    if context.get('group'):
+        return 'group'
+    return 'feed'
+
+
+def _labels(post, variant):
+    """Подписи автора и сообщества, которые показывает вариант карточки:
+    пост их не хранит, и время его изменения их не отражает."""
+    if variant == 'profile':
+        labels = [post.author.get_full_name()]
+    else:
+        labels = [post.author.username]
+    if variant != 'group' and post.group_id is not None:
+        labels += [post.group.slug, post.group.title]
+    return hashlib.md5('\n'.join(labels).encode()).hexdigest()
+
+
+def card_key(post, variant):
+    thumbnail = 1 if getattr(post, 'thumbnail', None) else 0
+    return (f'card:{post.pk}:{post.modified.timestamp()}:{variant}:'
+            f'{thumbnail}:{_labels(post, variant)}')
+
+
+def render_cards(context, posts):
+    """HTML карточек постов страницы: найденные в кэше берутся одним
+    get_many, остальные рендерятся и сохраняются одним set_many."""
+    variant = card_variant(context)
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    # Узлы шаблона рендерятся прямо в контексте страницы, без include:
+    # memo_url разрешает общие адреса один раз на все карточки.
+    nodelist = context.template.engine.get_template(CARD_TEMPLATE).nodelist
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            with context.push(post=post):
+                cards[key] = missing[key] = nodelist.render(context)
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+    return [cards[key] for key in keys]
@@ -0,0 +1,92 @@
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Follow, Group, Post, UserCounters
+from .utils import bulk_insert
+
+
+def _shift(name, delta):
+    # Счётчик не уходит ниже нуля, даже если уже разошёлся с данными.
+    return Greatest(F(name) + delta, 0)
+
+
+def change_user(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на deltas."""
+    changes = {name: _shift(name, delta) for name, delta in deltas.items()}
+    updated = UserCounters.objects.filter(user_id=user_id).update(**changes)
+    if not updated and min(deltas.values()) > 0:
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**changes)
+
+
+def change_users(user_ids, **deltas):
+    """Сдвигает одинаково счётчики нескольких пользователей одним UPDATE."""
+    if min(deltas.values()) > 0:
+        UserCounters.objects.bulk_create(
+            (UserCounters(user_id=user_id) for user_id in user_ids),
+            ignore_conflicts=True,
+        )
+    changes = {name: _shift(name, delta) for name, delta in deltas.items()}
+    UserCounters.objects.filter(user_id__in=user_ids).update(**changes)
+
+
+def change_group(group_id, delta):
+    Group.objects.filter(pk=group_id).update(
+        posts_count=_shift('posts_count', delta)
+    )
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shift('comments_count', delta)
+    )
+
+
+def _count(model, field, outer='pk'):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def user_counters(user):
+    """Счётчики пользователя. Строку, которой нет (пользователь из
+    фикстуры или raw-сохранения, миграция без пересчёта), заводит и
+    считает по исходным таблицам."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        pass
+    _, created = UserCounters.objects.get_or_create(user=user)
+    if created:
+        UserCounters.objects.filter(user=user).update(
+            posts_count=_count(Post, 'author', 'user'),
+            followers_count=_count(Follow, 'author', 'user'),
+            following_count=_count(Follow, 'user', 'user'),
+        )
+    user.counters = UserCounters.objects.get(user=user)
+    return user.counters
+
+
+def recount(apps=global_apps):
+    """Пересчитывает все счётчики по исходным таблицам."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    bulk_insert(UserCounters.objects, (
+        UserCounters(user_id=pk)
+        for pk in User.objects.values_list('pk', flat=True).iterator()
+    ), ignore_conflicts=True)
+    UserCounters.objects.update(
+        posts_count=_count(Post, 'author', 'user'),
+        followers_count=_count(Follow, 'author', 'user'),
+        following_count=_count(Follow, 'user', 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
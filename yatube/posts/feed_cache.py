@@ -0,0 +1,237 @@
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.utils.cache import patch_cache_control
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition, require_safe
+
+from .utils import (CURSOR_KEYS, POSTS_OF_PAGE, CursorPage, CursorPaginator,
+                    WindowPaginator, _attach_cursors, page_context)
+
+FEED_CACHE_TIMEOUT = settings.FEED_CACHE_TIMEOUT
+ANONYMOUS_MAX_AGE = settings.ANONYMOUS_MAX_AGE
+COUNT_CACHE_TIMEOUT = settings.COUNT_CACHE_TIMEOUT
+
+
+def _version_key(feed):
+    return f'feed-version:{feed}'
+
+
+def _modified_key(feed):
+    return f'feed-modified:{feed}'
+
+
+def _new_version():
+    # Версия, заведённая заново после вытеснения ключа, не совпадёт
+    # ни с одной из старых, и устаревшие записи не воскреснут.
+    return int(time.time() * 1000)
+
+
+def stored_versions(*feeds):
+    """Версии лент, как их хранит кэш; отсутствующие заводятся заново.
+
+    Кэш без хранения (DummyCache) версий не держит: для его лент
+    возвращается None, и сверка с такой версией ничего не подтверждает.
+    """
+    keys = [_version_key(feed) for feed in feeds]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def get_versions(*feeds):
+    """Текущие версии лент; отсутствующие заводятся заново."""
+    # Без хранения версия новая на каждый запрос: ничего не считается
+    # свежим.
+    return tuple(_new_version() if version is None else version
+                 for version in stored_versions(*feeds))
+
+
+def bump(*feeds):
+    """Сбрасывает кэш лент, увеличивая их версии."""
+    for feed in feeds:
+        key = _version_key(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _new_version(), None)
+    now = time.time()
+    cache.set_many({_modified_key(feed): now for feed in feeds}, None)
+
+
+def last_modified(*feeds):
+    """Время последнего изменения лент с точностью до секунды.
+
+    Для ленты, чья отметка вытеснена из кэша, временем изменения
+    считается текущий момент.
+    """
+    keys = [_modified_key(feed) for feed in feeds]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            now = time.time()
+            cache.add(key, now, None)
+            stored = cache.get(key)
+            stamps[key] = now if stored is None else stored
+    return datetime.fromtimestamp(int(max(stamps.values())), timezone.utc)
+
+
+def etag(feeds, *parts):
+    """Сильный ETag по версиям лент и прочим частям ответа."""
+    value = '|'.join(map(str, (*feeds, *get_versions(*feeds), *parts)))
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def versioned_key(prefix, feeds, suffix):
+    """Ключ кэша, который устаревает при изменении любой из лент."""
+    versions = '.'.join(map(str, get_versions(*feeds)))
+    return f'{prefix}:{":".join(feeds)}:{versions}:{suffix}'
+
+
+def cached(feeds, suffix, compute):
+    """Значение compute(), закэшированное под текущими версиями лент."""
+    key = versioned_key('feed', feeds, suffix)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, FEED_CACHE_TIMEOUT)
+    return value
+
+
+def cached_count(name, compute):
+    """Число записей compute(), закэшированное на COUNT_CACHE_TIMEOUT.
+
+    Ключ не зависит от версий лент: после новых постов число отстаёт,
+    зато COUNT(*) не повторяется на каждую новую версию. Для номеров
+    страниц WindowPaginator этого достаточно.
+    """
+    key = f'count:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, COUNT_CACHE_TIMEOUT)
+    return value
+
+
+def _dump_page(page):
+    if getattr(page, 'is_cursor', False):
+        return ('cursor', list(page), page.has_next(), page.has_previous())
+    return ('page', list(page), page.number, page.paginator.count)
+
+
+def _load_page(entry, post_list, keys, per_page):
+    kind, object_list, *state = entry
+    if kind == 'cursor':
+        has_next, has_previous = state
+        paginator = CursorPaginator(post_list, per_page, keys)
+        page = CursorPage(object_list, paginator, has_next, has_previous)
+    else:
+        number, count = state
+        paginator = WindowPaginator(post_list, per_page, lambda: count)
+        page = Page(object_list, number, paginator)
+        page.page_window = paginator.window(number)
+    return _attach_cursors(page, keys)
+
+
+def cached_page_context(request, feeds, post_list, keys=CURSOR_KEYS,
+                        per_page=POSTS_OF_PAGE, cursor_only=False,
+                        count=None, on_miss=None):
+    """page_context, который при попадании в кэш не обращается к БД.
+
+    on_miss вызывается перед расчётом страницы, которой нет в кэше.
+    """
+    suffix = ':'.join((
+        'cursor' if cursor_only else 'page',
+        *(request.GET.get(param, '') for param in ('after', 'before')),
+        '' if cursor_only else request.GET.get('page', ''),
+    ))
+
+    def compute():
+        if on_miss is not None:
+            on_miss()
+        return _dump_page(page_context(request, post_list, keys, per_page,
+                                       cursor_only, count))
+
+    entry = cached(feeds, suffix, compute)
+    return _load_page(entry, post_list, keys, per_page)
+
+
+def _feeds(request, feeds_func, kwargs):
+    # Ленты нужны и для ETag, и для Last-Modified: считаются один раз.
+    if not hasattr(request, 'feeds'):
+        request.feeds = feeds_func(request, **kwargs)
+    return request.feeds
+
+
+def _csrf_secret(request):
+    """Значение cookie CSRF, от которого зависят формы на странице.
+
+    После повторного входа оно другое; без него в ETag 304 оставил бы
+    в браузере форму со старым токеном. get_token() каждый раз маскирует
+    токен заново, поэтому в ETag идёт само значение cookie.
+    """
+    if not request.user.is_authenticated:
+        return ''
+    get_token(request)
+    return request.META['CSRF_COOKIE']
+
+
+def conditional(feeds_func, personal_feeds=None):
+    """ETag и Last-Modified по версиям лент feeds_func(request, **kwargs).
+
+    Свежесть проверяется до основного запроса и рендеринга: если лента
+    не менялась, ответ 304. Если feeds_func вернула None, заголовки
+    не ставятся и ответ формирует само представление (404, 401).
+
+    Last-Modified отдаётся только анонимам: после входа или выхода
+    страница меняется, а время изменения лент -- нет. ETag учитывает
+    пользователя, его токен CSRF и ленты personal_feeds(request), от
+    которых зависят личные фрагменты страницы: в request.feeds и ключ
+    общего каркаса они не входят.
+    """
+    def etag_func(request, **kwargs):
+        feeds = _feeds(request, feeds_func, kwargs)
+        if feeds is not None:
+            if personal_feeds is not None and request.user.is_authenticated:
+                feeds = (*feeds, *personal_feeds(request))
+            return etag(feeds, request.user.pk, _csrf_secret(request),
+                        request.path, request.GET.urlencode())
+
+    def last_modified_func(request, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        feeds = _feeds(request, feeds_func, kwargs)
+        if feeds is not None:
+            return last_modified(*feeds)
+
+    def decorator(view):
+        wrapper = functools.wraps(view)(require_safe(condition(
+            etag_func, last_modified_func
+        )(view)))
+        # По нему page_cache находит ленты страницы до вызова view.
+        wrapper.feeds_func = feeds_func
+        return wrapper
+    return decorator
+
+
+def cache_control(view):
+    """Анонимам -- публичный ответ на ANONYMOUS_MAX_AGE секунд для
+    обратного прокси, остальным -- частный с обязательной проверкой."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True,
+                                max_age=ANONYMOUS_MAX_AGE)
+        return response
+    return wrapper
@@ -0,0 +1,149 @@
+"""Запросы лент, общие для HTML-страниц и JSON API.
+
+Функции *_feeds возвращают имена лент, по версиям которых строятся
+ключи кэша и ETag; feeds_for_* -- то же по аргументам адреса, для
+feed_cache.conditional; *_page -- страницу ленты с миниатюрами.
+"""
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+
+from .counters import user_counters
+from .feed_cache import cached_count, cached_page_context
+from .follow_graph import graph
+from .models import Comment, Group, Post, Recommendation, User
+from .thumbnails import prefetch_thumbnails
+from .timeline import FEED_KEYS, feed_posts, feed_size, pull_popular
+
+COMMENTS_OF_PAGE = settings.COMMENTS_OF_PAGE
+RECOMMENDATIONS_COUNT = settings.RECOMMENDATIONS_COUNT
+RECOMMENDATIONS_SHOWN = settings.RECOMMENDATIONS_SHOWN
+
+
+def index_feeds():
+    return ('index',)
+
+
+def group_feeds(group_id):
+    return (f'group:{group_id}',)
+
+
+def profile_feeds(author_id):
+    return (f'profile:{author_id}',)
+
+
+def follow_feeds(user_id):
+    # Новые посты популярных авторов попадают в ленту только при
+    # чтении, поэтому лента подписок зависит и от версии главной.
+    return ('index', f'follow:{user_id}')
+
+
+def post_feeds(post_id):
+    return (f'post:{post_id}', f'comments:{post_id}')
+
+
+def _pk(queryset, **lookup):
+    return queryset.filter(**lookup).values_list('pk', flat=True).first()
+
+
+def feeds_for_group(request, slug):
+    group_id = _pk(Group.objects, slug=slug)
+    return None if group_id is None else group_feeds(group_id)
+
+
+def feeds_for_profile(request, username):
+    """Ленты профиля вместе с подписками автора: на странице есть
+    их счётчики и кнопка подписки."""
+    author_id = _pk(User.objects, username=username)
+    if author_id is not None:
+        return (*profile_feeds(author_id), f'follows:{author_id}')
+
+
+def feeds_for_viewer(request):
+    """Ленты личных фрагментов страницы: рекомендации читателя меняются
+    при пересчёте и при его подписках."""
+    return ('recommendations', f'follows:{request.user.pk}')
+
+
+def feeds_for_follow(request):
+    if request.user.is_authenticated:
+        return follow_feeds(request.user.pk)
+
+
+def feeds_for_post(request, post_id):
+    """Ленты страницы поста: на ней есть и счётчик постов автора."""
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author', flat=True
+    ).first()
+    if author_id is not None:
+        return (*post_feeds(post_id), *profile_feeds(author_id))
+
+
+def index_page(request, cursor_only=False):
+    return prefetch_thumbnails(cached_page_context(
+        request, index_feeds(),
+        Post.objects.select_related('author', 'group'),
+        cursor_only=cursor_only,
+        count=lambda: cached_count('index', Post.objects.count),
+    ))
+
+
+def group_page(request, group, cursor_only=False):
+    return prefetch_thumbnails(cached_page_context(
+        request, group_feeds(group.pk),
+        group.posts.select_related('author'),
+        cursor_only=cursor_only, count=lambda: group.posts_count,
+    ))
+
+
+def profile_page(request, author, cursor_only=False):
+    return prefetch_thumbnails(cached_page_context(
+        request, profile_feeds(author.pk),
+        author.posts.select_related('group'),
+        cursor_only=cursor_only,
+        count=lambda: user_counters(author).posts_count,
+    ))
+
+
+def follow_page(request, cursor_only=False):
+    user = request.user
+    return prefetch_thumbnails(cached_page_context(
+        request, follow_feeds(user.pk),
+        feed_posts(user).select_related('author', 'group'),
+        FEED_KEYS, cursor_only=cursor_only,
+        count=lambda: cached_count(f'follow:{user.pk}',
+                                   lambda: feed_size(user)),
+        on_miss=lambda: pull_popular(user),
+    ))
+
+
+def get_post(post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    user_counters(post.author)
+    prefetch_thumbnails([post])
+    return post
+
+
+def comments_page(request, post_id):
+    return cached_page_context(
+        request, (f'comments:{post_id}',),
+        Comment.objects.filter(post=post_id).select_related('author'),
+        per_page=COMMENTS_OF_PAGE, cursor_only=True,
+    )
+
+
+def who_to_follow(user, exclude=()):
+    """Готовые рекомендации пользователя из таблицы recommend_authors
+    без авторов, на которых он подписался после пересчёта."""
+    if not user.is_authenticated:
+        return []
+    recommendations = (Recommendation.objects.filter(user=user)
+                       .exclude(author__in=exclude)
+                       .select_related('author')
+                       .order_by('-score')[:RECOMMENDATIONS_COUNT])
+    return [
+        recommendation for recommendation in recommendations
+        if not graph.is_following(user.pk, recommendation.author_id)
+    ][:RECOMMENDATIONS_SHOWN]
@@ -0,0 +1,187 @@
+"""Граф подписок в памяти процесса.
+
+Для пользователя хранятся два отсортированных массива array('q'): id
+авторов, на которых он подписан, и id подписчиков. Проверка подписки
+-- двоичный поиск, число подписок и подписчиков -- длина массива.
+
+Массивы загружаются пачками по требованию, каждое направление отдельно
+и только то, что запрошено: проверке подписки не нужны подписчики.
+Каждый массив сверяется с версией ленты follows:<id> из feed_cache,
+которую увеличивает каждая подписка и отписка пользователя. Сверка --
+один get_many на пачку пользователей, не чаще раза за запрос и не реже
+FOLLOW_GRAPH_TTL секунд вне запросов; к кэшу она обращается до взятия
+блокировки. Подписки этого процесса
+применяются к массивам сразу, без перезагрузки. Если кэш версий не
+хранит (None), массивы считаются устаревшими при каждой сверке.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from . import feed_cache
+from .models import Follow
+
+FOLLOW_GRAPH_TTL = settings.FOLLOW_GRAPH_TTL
+FOLLOW_GRAPH_MAX_USERS = settings.FOLLOW_GRAPH_MAX_USERS
+# Сколько id подставлять в один запрос IN: у SQLite предел параметров.
+LOAD_BATCH_SIZE = 500
+FOLLOWING = 'user'
+FOLLOWERS = 'author'
+
+
+def _feed(user_id):
+    return f'follows:{user_id}'
+
+
+def _contains(values, value):
+    index = bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+
+class FollowGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Направление -- поле Follow, по которому выбираются строки:
+        # FOLLOWING -- подписки пользователя, FOLLOWERS -- подписчики.
+        self._adjacency = {FOLLOWING: {}, FOLLOWERS: {}}
+        # (направление, id) -> (версия follows:<id>, когда сверена с кэшем)
+        self._checked = {}
+        self._epoch = 0.0
+
+    def clear(self):
+        with self._lock:
+            for adjacency in self._adjacency.values():
+                adjacency.clear()
+            self._checked.clear()
+
+    def expire(self):
+        """Требует сверить версии заново; вызывается в начале запроса."""
+        self._epoch = time.monotonic()
+
+    def _due(self, keys, now):
+        due = []
+        for key in keys:
+            checked = self._checked.get(key)
+            if (checked is None or checked[1] < self._epoch
+                    or now - checked[1] > FOLLOW_GRAPH_TTL):
+                due.append(key)
+        return due
+
+    def _fetch(self, field, user_ids):
+        other = 'author' if field == FOLLOWING else 'user'
+        adjacency = {user_id: array('q') for user_id in user_ids}
+        for start in range(0, len(user_ids), LOAD_BATCH_SIZE):
+            rows = Follow.objects.filter(**{
+                f'{field}__in': user_ids[start:start + LOAD_BATCH_SIZE]
+            }).order_by(field, other).values_list(field, other)
+            for user_id, other_id in rows.iterator():
+                adjacency[user_id].append(other_id)
+        return adjacency
+
+    def load(self, user_ids, directions=(FOLLOWING, FOLLOWERS)):
+        """Загружает и сверяет с кэшем смежность пользователей пачкой:
+        один get_many версий и по запросу на направление из directions,
+        в котором есть устаревшие."""
+        now = time.monotonic()
+        due = self._due([(direction, user_id) for direction in directions
+                         for user_id in set(user_ids)], now)
+        if not due:
+            return
+        due_ids = sorted({user_id for _, user_id in due})
+        versions = dict(zip(due_ids, feed_cache.stored_versions(
+            *map(_feed, due_ids)
+        )))
+        stale = {direction: [] for direction in directions}
+        with self._lock:
+            for key in due:
+                direction, user_id = key
+                checked = self._checked.get(key)
+                if (checked is not None and versions[user_id] is not None
+                        and checked[0] == versions[user_id]):
+                    self._checked[key] = (checked[0], now)
+                else:
+                    stale[direction].append(user_id)
+        fetched = {direction: self._fetch(direction, user_ids)
+                   for direction, user_ids in stale.items() if user_ids}
+        if not fetched:
+            return
+        with self._lock:
+            for direction, adjacency in fetched.items():
+                for user_id, values in adjacency.items():
+                    self._adjacency[direction][user_id] = values
+                    self._checked[direction, user_id] = (versions[user_id],
+                                                         now)
+            # Вытесняются загруженные раньше всех.
+            while len(self._checked) > FOLLOW_GRAPH_MAX_USERS:
+                self._forget(next(iter(self._checked)))
+
+    def _forget(self, key):
+        direction, user_id = key
+        self._adjacency[direction].pop(user_id, None)
+        self._checked.pop(key, None)
+
+    def _apply(self, key, version, other_ids=(), added=True):
+        """Вносит изменение в загруженный массив, если версия выросла
+        ровно на bump() этой пачки подписок; иначе массив загрузится
+        заново. Без other_ids только переносит массив на новую версию:
+        подписка меняет одно направление, а версия у них общая."""
+        checked = self._checked.get(key)
+        if checked is None:
+            return
+        if (version is None or checked[0] is None
+                or version != checked[0] + 1):
+            self._forget(key)
+            return
+        direction, user_id = key
+        values = self._adjacency[direction][user_id]
+        for other_id in other_ids:
+            present = _contains(values, other_id)
+            if added and not present:
+                insort(values, other_id)
+            elif not added and present:
+                values.pop(bisect_left(values, other_id))
+        self._checked[key] = (version, checked[1])
+
+    def changed(self, user_id, author_ids, added):
+        """Подписка или отписка user_id от авторов author_ids; вызывается
+        после одного feed_cache.bump() их лент follows на всю пачку."""
+        version, *versions = feed_cache.stored_versions(
+            _feed(user_id), *map(_feed, author_ids),
+        )
+        with self._lock:
+            self._apply((FOLLOWING, user_id), version, author_ids, added)
+            self._apply((FOLLOWERS, user_id), version)
+            for author_id, version in zip(author_ids, versions):
+                self._apply((FOLLOWERS, author_id), version, (user_id,),
+                            added)
+                self._apply((FOLLOWING, author_id), version)
+
+    def _get(self, direction, user_id):
+        self.load([user_id], (direction,))
+        values = self._adjacency[direction].get(user_id)
+        if values is None:
+            # Вытеснен соседним потоком сразу после загрузки.
+            values = self._fetch(direction, [user_id])[user_id]
+        return values
+
+    def is_following(self, user_id, author_id):
+        return _contains(self._get(FOLLOWING, user_id), author_id)
+
+    def following(self, user_id):
+        """id авторов, на которых подписан пользователь, по возрастанию."""
+        return list(self._get(FOLLOWING, user_id))
+
+    def followers(self, user_id):
+        return list(self._get(FOLLOWERS, user_id))
+
+    def following_count(self, user_id):
+        return len(self._get(FOLLOWING, user_id))
+
+    def followers_count(self, user_id):
+        return len(self._get(FOLLOWERS, user_id))
+
+
+graph = FollowGraph()
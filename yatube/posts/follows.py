@@ -0,0 +1,108 @@
+"""Подписки и отписки пачкой.
+
+Одиночная подписка через ORM и пачка из bulk_follow/bulk_unfollow
+приводят к одним и тем же последствиям (followed/unfollowed): счётчики,
+ленты, версии кэша и граф подписок меняются один раз на пачку, а не
+на каждого автора.
+"""
+from django.db import connection, transaction
+
+from . import counters, feed_cache, tasks, timeline
+from .follow_graph import graph
+from .models import Follow, User
+
+# Сколько имён принимать за раз: все они уходят в один запрос IN.
+FOLLOW_BULK_LIMIT = 100
+
+
+def _bump(user_id, author_ids):
+    feed_cache.bump(f'follow:{user_id}', f'follows:{user_id}',
+                    *(f'follows:{author_id}' for author_id in author_ids))
+
+
+def _after_commit(user_id, author_ids, added):
+    # Версии растут только после фиксации: иначе параллельный запрос
+    # положил бы под новую версию ленты ещё старые подписки. После
+    # отката не меняются ни версии, ни граф.
+    def changed():
+        _bump(user_id, author_ids)
+        graph.changed(user_id, author_ids, added)
+    transaction.on_commit(changed)
+
+
+def _lock(user_id):
+    """Блокирует строку пользователя до конца транзакции: его пачки
+    подписок и отписок идут по очереди, и прочитанные подписки не
+    устаревают до записи. SQLite блокирует запись всей базы и без
+    этого."""
+    list(User.objects.select_for_update().filter(pk=user_id)
+         .values_list('pk', flat=True))
+
+
+def followed(user_id, author_ids):
+    """Последствия новых подписок user_id на авторов author_ids."""
+    counters.change_users(author_ids, followers_count=1)
+    counters.change_user(user_id, following_count=len(author_ids))
+    tasks.add_authors.enqueue({'user': user_id, 'authors': author_ids})
+    _after_commit(user_id, author_ids, True)
+
+
+def unfollowed(user_id, author_ids):
+    """Последствия отписки user_id от авторов author_ids."""
+    counters.change_users(author_ids, followers_count=-1)
+    counters.change_user(user_id, following_count=-len(author_ids))
+    timeline.remove_authors(user_id, author_ids)
+    _after_commit(user_id, author_ids, False)
+
+
+def resolve(usernames):
+    """id пользователей по именам одним запросом: {username: id}."""
+    return dict(User.objects.filter(username__in=set(usernames))
+                .values_list('username', 'pk'))
+
+
+def _followed_ids(user, author_ids):
+    return set(Follow.objects.filter(user=user, author__in=author_ids)
+               .values_list('author', flat=True))
+
+
+def bulk_follow(user, author_ids):
+    """Подписывает user на авторов одним INSERT; возвращает id авторов,
+    подписка на которых появилась только сейчас."""
+    with transaction.atomic():
+        # Под блокировкой подписки, которых не было при чтении, не
+        # появятся до INSERT: ignore_conflicts ничего не пропустит, и
+        # new_ids -- ровно вставленные строки.
+        _lock(user.pk)
+        existing = _followed_ids(user, author_ids)
+        new_ids = sorted(set(author_ids) - existing - {user.pk})
+        if not new_ids:
+            return []
+        # bulk_create не шлёт post_save: последствия -- в followed().
+        Follow.objects.bulk_create(
+            (Follow(user=user, author_id=author_id) for author_id in new_ids),
+            ignore_conflicts=True,
+        )
+        followed(user.pk, new_ids)
+    return new_ids
+
+
+def bulk_unfollow(user, author_ids):
+    """Отписывает user от авторов одним DELETE ... IN; возвращает id
+    авторов, подписка на которых была."""
+    with transaction.atomic():
+        _lock(user.pk)
+        removed_ids = sorted(_followed_ids(user, author_ids))
+        if not removed_ids:
+            return []
+        # Удаление через ORM выбрало бы строки и разослало post_delete
+        # по одной; последствия -- в unfollowed().
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Follow._meta.db_table} '
+                'WHERE user_id = %s AND author_id IN '
+                f'({", ".join(["%s"] * len(removed_ids))})',
+                [user.pk, *removed_ids],
+            )
+        unfollowed(user.pk, removed_ids)
+    return removed_ids
@@ -0,0 +1,360 @@
+"""Нагрузочный прогон без сети: потоки шлют смесь запросов прямо
+в WSGI-приложение yatube.wsgi.application.
+
+Сценарии -- анонимное чтение главной по номерам страниц и ленты API
+по курсорам, лента подписок, посты, комментарии и подписки от имени
+вошедших пользователей. Итог -- пропускная способность, перцентили
+и гистограмма задержек по каждому сценарию.
+"""
+import io
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connections
+from django.urls import reverse
+
+from .benchmark import percentile
+from .models import Post
+
+User = get_user_model()
+
+DEFAULT_MIX = {
+    'index': 40,
+    'post_detail': 15,
+    'api_scroll': 10,
+    'follow_index': 20,
+    'add_comment': 8,
+    'post_create': 4,
+    'follow': 3,
+}
+# Верхние границы корзин гистограммы, мс; последняя корзина -- всё дольше.
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Сколько страниц ленты API листает один проход api_scroll.
+SCROLL_DEPTH = 5
+# Посты для чтения и комментариев берутся из последних SAMPLE_POSTS.
+SAMPLE_POSTS = 10000
+
+
+class WsgiClient:
+    """Клиент, который вызывает WSGI-приложение напрямую и хранит
+    cookie между запросами, как браузер."""
+
+    def __init__(self, application):
+        self.application = application
+        self.cookies = {}
+
+    def _environ(self, method, path, data):
+        path, _, query = path.partition('?')
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if self.cookies:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        if method == 'POST' and settings.CSRF_COOKIE_NAME in self.cookies:
+            environ['HTTP_X_CSRFTOKEN'] = self.cookies[
+                settings.CSRF_COOKIE_NAME
+            ]
+        return environ
+
+    def request(self, method, path, data=None):
+        """Статус и тело ответа."""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        result = self.application(self._environ(method, path, data),
+                                  start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            # Закрытие ответа шлёт request_finished: Django закрывает
+            # устаревшие соединения с БД.
+            if hasattr(result, 'close'):
+                result.close()
+        for name, value in response['headers']:
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    if morsel.value:
+                        self.cookies[morsel.key] = morsel.value
+                    else:
+                        self.cookies.pop(morsel.key, None)
+        return response['status'], body
+
+
+def login(application, user):
+    """Клиент с сессией пользователя и cookie CSRF для POST-запросов."""
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    client = WsgiClient(application)
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    # Форма нового поста выдаёт cookie csrftoken.
+    client.request('GET', reverse('posts:post_create'))
+    return client
+
+
+class Stats:
+    """Задержки и статусы ответов по сценариям; общий для потоков."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.statuses = {}
+
+    def add(self, scenario, status, elapsed_ms):
+        with self.lock:
+            self.timings.setdefault(scenario, []).append(elapsed_ms)
+            self.statuses.setdefault(scenario, Counter())[status] += 1
+
+
+def histogram(timings):
+    """Число запросов в каждой корзине HISTOGRAM_BOUNDS."""
+    buckets = Counter()
+    for elapsed in timings:
+        for bound in HISTOGRAM_BOUNDS:
+            if elapsed <= bound:
+                buckets[f'<={bound}'] += 1
+                break
+        else:
+            buckets[f'>{HISTOGRAM_BOUNDS[-1]}'] += 1
+    labels = [f'<={bound}' for bound in HISTOGRAM_BOUNDS]
+    labels.append(f'>{HISTOGRAM_BOUNDS[-1]}')
+    return {label: buckets[label] for label in labels}
+
+
+class Worker(threading.Thread):
+    """Поток, который выполняет сценарии, пока не кончится бюджет
+    запросов прогона или время."""
+
+    def __init__(self, runner, number, sessions):
+        super().__init__(name=f'loadtest-{number}', daemon=True)
+        self.runner = runner
+        self.rng = random.Random(runner.seed * 1000 + number)
+        self.anonymous = WsgiClient(runner.application)
+        self.sessions = sessions
+        self.next_page = None
+        self.scroll_depth = 0
+        self.error = None
+
+    def request(self, scenario, client, method, path, data=None):
+        start = time.perf_counter()
+        status, body = client.request(method, path, data)
+        self.runner.stats.add(scenario, status,
+                              (time.perf_counter() - start) * 1000)
+        return status, body
+
+    def session(self):
+        return self.rng.choice(self.sessions)
+
+    def post_id(self):
+        return self.rng.choice(self.runner.post_ids)
+
+    def index(self):
+        page = self.rng.randint(1, self.runner.pages)
+        self.request('index', self.anonymous, 'GET',
+                     f'{reverse("posts:index")}?page={page}')
+
+    def post_detail(self):
+        self.request('post_detail', self.anonymous, 'GET',
+                     reverse('posts:post_detail', args=(self.post_id(),)))
+
+    def api_scroll(self):
+        path = self.next_page or reverse('posts:api_index')
+        status, body = self.request('api_scroll', self.anonymous, 'GET',
+                                    path)
+        self.scroll_depth += 1
+        self.next_page = None
+        if status == 200 and self.scroll_depth < SCROLL_DEPTH:
+            self.next_page = json.loads(body)['next']
+        if self.next_page is None:
+            self.scroll_depth = 0
+
+    def follow_index(self):
+        self.request('follow_index', self.session(), 'GET',
+                     reverse('posts:follow_index'))
+
+    def add_comment(self):
+        self.request('add_comment', self.session(), 'POST',
+                     reverse('posts:add_comment', args=(self.post_id(),)),
+                     {'text': 'Комментарий нагрузочного прогона'})
+
+    def post_create(self):
+        self.request('post_create', self.session(), 'POST',
+                     reverse('posts:post_create'),
+                     {'text': 'Пост нагрузочного прогона'})
+
+    def follow(self):
+        view = self.rng.choice(('posts:profile_follow',
+                                'posts:profile_unfollow'))
+        username = self.rng.choice(self.runner.usernames)
+        self.request('follow', self.session(), 'GET',
+                     reverse(view, args=(username,)))
+
+    def run(self):
+        scenarios = list(self.runner.mix)
+        weights = [self.runner.mix[name] for name in scenarios]
+        try:
+            while self.runner.take():
+                getattr(self, self.rng.choices(scenarios, weights)[0])()
+        except Exception as error:
+            self.error = error
+            self.runner.stop()
+        finally:
+            connections.close_all()
+
+
+class Runner:
+    """Прогон: requests запросов или duration секунд в threads потоках."""
+
+    def __init__(self, application, mix=None, threads=4, requests=1000,
+                 duration=None, sessions=50, pages=5, seed=0):
+        unknown = set(mix or ()) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f'Неизвестные сценарии: {", ".join(unknown)}')
+        self.application = application
+        self.mix = {name: weight for name, weight
+                    in (mix or DEFAULT_MIX).items() if weight > 0}
+        self.threads = threads
+        self.requests = requests
+        self.duration = duration
+        self.sessions = sessions
+        self.pages = pages
+        self.seed = seed
+        self.stats = Stats()
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.deadline = None
+
+    def take(self):
+        """Забирает один запрос из бюджета прогона."""
+        with self.lock:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                return False
+            if self.requests is not None and self.issued >= self.requests:
+                return False
+            self.issued += 1
+            return True
+
+    def stop(self):
+        with self.lock:
+            self.requests = self.issued
+
+    def _prepare(self):
+        self.post_ids = list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:SAMPLE_POSTS])
+        self.usernames = list(User.objects.values_list('username', flat=True))
+        if not self.post_ids or len(self.usernames) < 2:
+            raise ValueError('Для прогона нужны посты и хотя бы двое '
+                             'пользователей')
+        readers = User.objects.order_by('-counters__following_count')
+        clients = [login(self.application, user)
+                   for user in readers[:self.sessions]]
+        # У каждого потока свои сессии, чтобы cookie не делились.
+        return [clients[number::self.threads] or clients
+                for number in range(self.threads)]
+
+    def run(self):
+        """Выполняет прогон и возвращает отчёт report()."""
+        workers = [Worker(self, number, sessions)
+                   for number, sessions in enumerate(self._prepare())]
+        start = time.perf_counter()
+        if self.duration is not None:
+            self.deadline = time.monotonic() + self.duration
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        for worker in workers:
+            if worker.error is not None:
+                raise worker.error
+        return report(self.stats, elapsed)
+
+
+def _summary(timings, statuses, elapsed):
+    return {
+        'requests': len(timings),
+        'errors': sum(count for status, count in statuses.items()
+                      if status >= 500),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p90_ms': round(percentile(timings, 0.9), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(max(timings), 3),
+        'statuses': {str(status): count
+                     for status, count in sorted(statuses.items())},
+        'histogram': histogram(timings),
+    }
+
+
+def report(stats, elapsed):
+    """Сводка прогона: общая и по сценариям."""
+    timings = [elapsed_ms for values in stats.timings.values()
+               for elapsed_ms in values]
+    if not timings:
+        return {'duration_s': round(elapsed, 3), 'total': None,
+                'scenarios': {}}
+    statuses = sum(stats.statuses.values(), Counter())
+    return {
+        'duration_s': round(elapsed, 3),
+        'total': _summary(timings, statuses, elapsed),
+        'scenarios': {
+            name: _summary(stats.timings[name], stats.statuses[name],
+                           elapsed)
+            for name in sorted(stats.timings)
+        },
+    }
+
+
+def format_report(data, width=40):
+    """Отчёт для терминала: строка метрик и гистограмма на сценарий."""
+    lines = [f'Длительность: {data["duration_s"]} с']
+    rows = [('Всего', data['total'])] if data['total'] else []
+    rows.extend(data['scenarios'].items())
+    for name, summary in rows:
+        lines.append(
+            f'{name}: {summary["requests"]} запросов, '
+            f'{summary["rps"]} в секунду, ошибок {summary["errors"]}, '
+            f'p50={summary["p50_ms"]} p90={summary["p90_ms"]} '
+            f'p99={summary["p99_ms"]} max={summary["max_ms"]} мс'
+        )
+        most = max(summary['histogram'].values())
+        for label, count in summary['histogram'].items():
+            if count:
+                bar = '#' * max(1, round(width * count / most))
+                lines.append(f'  {label:>7} мс {count:>7} {bar}')
+    return '\n'.join(lines)
@@ -0,0 +1,85 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Засевает тестовую базу и замеряет задержку, число запросов '
+            'и память представлений posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов к каждому представлению')
+        parser.add_argument('--card-repeats', type=int, default=200,
+                            help='Рендеров ленты для замера карточки поста')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmark.json'),
+            help='Файл с результатами, с которыми сравнивается прогон',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост времени и памяти, доля от baseline',
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты в baseline вместо сравнения',
+        )
+
+    def handle(self, *args, **options):
+        scale = {name: options[name]
+                 for name in ('users', 'posts', 'comments', 'follows',
+                              'requests', 'seed')}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            self.stdout.write('Засев данных...')
+            benchmark.seed(options['users'], options['posts'],
+                           options['comments'], options['follows'],
+                           seed=options['seed'])
+            results = benchmark.measure(options['requests'], options['seed'])
+            results.update(benchmark.measure_cards(options['card_repeats']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        for view, metrics in results.items():
+            self.stdout.write(f'{view}: ' + ', '.join(
+                f'{metric}={value}' for metric, value in metrics.items()
+            ))
+        self.check_baseline(options, scale, results)
+
+    def check_baseline(self, options, scale, results):
+        path = options['baseline']
+        if options['update_baseline'] or not os.path.exists(path):
+            with open(path, 'w') as baseline:
+                json.dump({'scale': scale, 'views': results}, baseline,
+                          indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Baseline записан в {path}'))
+            return
+        with open(path) as baseline:
+            baseline = json.load(baseline)
+        if baseline['scale'] != scale:
+            raise CommandError(
+                f'Baseline {path} снят на других объёмах {baseline["scale"]}; '
+                'запустите с --update-baseline'
+            )
+        regressions = benchmark.compare(results, baseline['views'],
+                                        options['threshold'])
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.transfer import (EXPORT_CHUNK_SIZE, FORMATS, export_posts,
+                            format_for)
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в файл JSONL или CSV потоком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл для выгрузки; по умолчанию stdout')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='По умолчанию определяется по расширению файла',
+        )
+        parser.add_argument('--chunk-size', type=int,
+                            default=EXPORT_CHUNK_SIZE)
+        parser.add_argument('--author', help='Только посты автора')
+        parser.add_argument('--group', help='Только посты группы (slug)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        posts = Post.objects.all()
+        if options['author']:
+            posts = posts.filter(author__username=options['author'])
+        if options['group']:
+            posts = posts.filter(group__slug=options['group'])
+        if path == '-':
+            # Строки выгрузки заканчиваются переводом строки, и
+            # OutputWrapper не добавит к ним свой.
+            total = export_posts(self.stdout, fmt, posts,
+                                 options['chunk_size'])
+            self.stderr.write(f'Выгружено постов: {total}')
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            total = export_posts(output, fmt, posts, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Выгружено постов: {total}'))
@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (FORMATS, IMPORT_BATCH_SIZE, TransferError,
+                            format_for, import_posts)
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты из файла JSONL или CSV пакетами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с постами; - для stdin')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='По умолчанию определяется по расширению файла',
+        )
+        parser.add_argument('--batch-size', type=int,
+                            default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--images-dir',
+            help='Откуда брать изображения по относительным путям; '
+                 'по умолчанию MEDIA_ROOT',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        source = (sys.stdin if path == '-'
+                  else open(path, newline='', encoding='utf-8'))
+        try:
+            total = import_posts(
+                source, fmt, options['batch_size'], options['images_dir'],
+                options['create_missing'],
+            )
+        except TransferError as error:
+            raise CommandError(error)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(self.style.SUCCESS(f'Загружено постов: {total}'))
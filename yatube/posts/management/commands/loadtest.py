@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment,
+)
+
+from posts import benchmark, loadtest
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def parse_mix(value):
+    """Смесь сценариев из строки вида index=40,follow_index=20."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        try:
+            mix[name.strip()] = int(weight)
+        except ValueError:
+            raise CommandError(f'Неверный вес в {item!r}')
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон смеси запросов через WSGI-приложение '
+            'в несколько потоков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Всего запросов за прогон')
+        parser.add_argument('--duration', type=float,
+                            help='Ограничение прогона по времени, секунд')
+        parser.add_argument(
+            '--mix', type=parse_mix,
+            help='Веса сценариев: ' + ','.join(
+                f'{name}={weight}'
+                for name, weight in loadtest.DEFAULT_MIX.items()
+            ),
+        )
+        parser.add_argument('--sessions', type=int, default=50,
+                            help='Сколько пользователей входят на сайт')
+        parser.add_argument('--pages', type=int, default=5,
+                            help='Глубина страниц главной в сценарии index')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Прогон с DummyCache вместо CACHES')
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Гонять на настроенной базе и кэше как есть; прогон '
+                 'пишет в неё посты, комментарии и подписки',
+        )
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Записать отчёт в файл JSON')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            if options['existing']:
+                data = self.run(options)
+            else:
+                data = self.run_on_test_db(options)
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            teardown_test_environment()
+        self.stdout.write(loadtest.format_report(data))
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(data, output, indent=2, sort_keys=True)
+
+    def run_on_test_db(self, options):
+        directory = None
+        if connection.vendor == 'sqlite':
+            # Потокам нужна общая база в файле: в памяти SQLite на
+            # конкурентной записи отвечает «table is locked».
+            directory = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                directory, 'loadtest.sqlite3'
+            )
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            self.stdout.write('Засев данных...')
+            benchmark.seed(options['users'], options['posts'],
+                           options['comments'], options['follows'],
+                           seed=options['seed'])
+            # Ключи тестовой базы не должны попасть в настроенный кэш,
+            # а его содержимое -- в прогон.
+            with override_settings(CACHES=benchmark.BENCHMARK_CACHES):
+                return self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if directory is not None:
+                os.rmdir(directory)
+
+    def run(self, options):
+        from yatube.wsgi import application
+
+        runner = loadtest.Runner(
+            application, options['mix'], options['threads'],
+            options['requests'], options['duration'], options['sessions'],
+            options['pages'], options['seed'],
+        )
+        if options['no_cache']:
+            with override_settings(CACHES=NO_CACHE):
+                return runner.run()
+        return runner.run()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import (RECOMMEND_BATCH_SIZE,
+                                   RECOMMENDATIONS_COUNT, recommend)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «на кого подписаться»'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=RECOMMEND_BATCH_SIZE,
+                            help='Читателей в одной пачке матриц')
+        parser.add_argument('--count', type=int,
+                            default=RECOMMENDATIONS_COUNT,
+                            help='Рекомендаций на читателя')
+
+    def handle(self, *args, **options):
+        users, written = recommend(options['batch_size'], options['count'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций: {written} для {users} пользователей'
+        ))
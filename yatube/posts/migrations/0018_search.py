@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:44
+
+import sqlite3
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Схема на момент миграции; правки posts.search её не меняют. Индекс
+# заполняет команда rebuild_search_index: разбор текста меняется вместе
+# с posts.search, и индекс после таких правок всё равно строится заново.
+FTS_TABLE = 'posts_search'
+
+
+def fts_enabled(db):
+    if db.vendor != 'sqlite':
+        return False
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE fts USING fts5(body)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def create_index(apps, schema_editor):
+    db = schema_editor.connection
+    if not fts_enabled(db):
+        return
+    # Документ ищется по rowid: посты чётные, комментарии нечётные.
+    with db.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'post_id UNINDEXED, post_text, comment_text, '
+            "tokenize='unicode61 remove_diacritics 0')"
+        )
+
+
+def drop_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Основа слова')),
+                ('document', models.CharField(max_length=40, verbose_name='Документ')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово индекса',
+                'verbose_name_plural': 'Слова индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term'], name='search_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['document'], name='search_document_idx'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
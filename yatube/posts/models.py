@@ -7,10 +7,38 @@ from core.models import Pub_dateModel
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountedModel(models.Model):
+    """Модель со счётчиками, которые двигает только posts.counters через
+    UPDATE с F(). Полный save() существующей записи их не пишет, иначе
+    устаревшее значение затёрло бы параллельные приращения."""
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if (update_fields is None and not self._state.adding
+                and not kwargs.get('force_insert')):
+            # Отложенные поля, как и в Model.save(), не пишутся.
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class Group(CountedModel):
     title = models.CharField('Имя группы', max_length=200)
     slug = models.SlugField('Ссылка', max_length=100, unique=True)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
+
+    counter_fields = ('posts_count',)
 
     class Meta:
         verbose_name = 'Группа'
@@ -20,7 +48,7 @@ class Group(models.Model):
         return self.title
 
 
-class Post(Pub_dateModel):
+class Post(CountedModel, Pub_dateModel):
     text = models.TextField('Пост', help_text='Чем хотите поделиться?')
     author = models.ForeignKey(
         User,
@@ -43,11 +71,28 @@ class Post(Pub_dateModel):
         blank=True,
         help_text='Можете добавить изображение к посту'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+
+    counter_fields = ('comments_count',)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты сортируются по (-pub_date, -id), см. utils.page_context.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -73,6 +118,12 @@ class Comment(Pub_dateModel):
         ordering = ('-pub_date',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date', '-id'],
+                name='comment_post_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -104,6 +155,140 @@ class Follow(models.Model):
                 name='revent_self_follow',
             ),
         ]
+        # Уникальность ведёт по user; проверка подписки на профиле
+        # ищет по author.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
 
         def __str__(self) -> str:
             return f'Пользователь {self.user} надписан на {self.author}'
+
+
+class Recommendation(models.Model):
+    """Автор, на которого стоит подписаться; строки пересчитывает
+    команда recommend_authors."""
+    FRIENDS = 'friends'
+    CO_FOLLOWING = 'co_following'
+    GROUPS = 'groups'
+    REASONS = (
+        (FRIENDS, 'Его читают ваши авторы'),
+        (CO_FOLLOWING, 'Его читают похожие на вас читатели'),
+        (GROUPS, 'Пишет в интересных вам сообществах'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.FloatField('Оценка')
+    reason = models.CharField('Причина', max_length=20, choices=REASONS)
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_recommendation'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='recommendation_user_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.author} для {self.user}'
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return f'Счётчики {self.user}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_item'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_date_post_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.post} в ленте {self.user}'
+
+
+class SearchTerm(models.Model):
+    """Запись инвертированного индекса, если в SQLite нет FTS5."""
+    term = models.CharField('Основа слова', max_length=100)
+    document = models.CharField('Документ', max_length=40)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    frequency = models.PositiveIntegerField('Число вхождений')
+
+    class Meta:
+        verbose_name = 'Слово индекса'
+        verbose_name_plural = 'Слова индекса'
+        indexes = [
+            models.Index(fields=['term'], name='search_term_idx'),
+            models.Index(fields=['document'], name='search_document_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.term} в {self.document}'
@@ -0,0 +1,112 @@
+"""Кэш страниц лент: общий каркас и личные фрагменты.
+
+Каркас страницы рендерится один раз на версию её лент без данных
+пользователя; шапка, переключатель лент, кнопка подписки и форма
+комментария ({% hole %}) дорисовываются для каждого запроса. Анонимам
+готовая страница целиком отдаётся из middleware раньше сессий,
+авторизации и CSRF.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core.templatetags.holes import HOLE_MARK
+
+from .feed_cache import FEED_CACHE_TIMEOUT, versioned_key
+
+HOLE_RE = re.compile(re.escape(HOLE_MARK).replace(r'\{\}', r'([\w/.-]+)'))
+# Заголовки ответа, которые ставят представление и middleware ниже
+# этого; при попадании в кэш они восстанавливаются из записи.
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control',
+                  'Vary', 'X-Frame-Options')
+
+
+def fill_holes(request, skeleton, context):
+    return HOLE_RE.sub(
+        lambda match: render_to_string(match.group(1), context, request),
+        skeleton,
+    )
+
+
+def render_page(request, template_name, shared, personal=None):
+    """Страница из кэшированного каркаса и личных фрагментов.
+
+    shared() -- контекст, одинаковый для всех; вызывается, только если
+    каркаса для текущих версий лент request.feeds (их выставляет
+    feed_cache.conditional) ещё нет. personal -- контекст фрагментов.
+    """
+    key = versioned_key('skeleton', request.feeds, request.get_full_path())
+    skeleton = cache.get(key)
+    if skeleton is None:
+        context = {**shared(), 'punch_holes': True, 'user': AnonymousUser()}
+        skeleton = render_to_string(template_name, context, request)
+        cache.set(key, skeleton, FEED_CACHE_TIMEOUT)
+    response = HttpResponse(fill_holes(request, skeleton, personal or {}))
+    response.page_cacheable = True
+    return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам страницы лент из кэша целиком.
+
+    Запрос без cookie сессии заведомо анонимный, поэтому проверить
+    кэш можно раньше SessionMiddleware и AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _feeds(self, request):
+        if (request.method != 'GET'
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        feeds_func = getattr(match.func, 'feeds_func', None)
+        if feeds_func is None:
+            return None
+        # Без cookie сессии пользователь анонимный; AuthenticationMiddleware
+        # потом всё равно выставит request.user заново.
+        request.user = AnonymousUser()
+        request.resolver_match = match
+        request.feeds = feeds_func(request, **match.kwargs)
+        return request.feeds
+
+    def __call__(self, request):
+        feeds = self._feeds(request)
+        if feeds is None:
+            return self.get_response(request)
+        key = versioned_key('page', feeds, request.get_full_path())
+        entry = cache.get(key)
+        if entry is not None:
+            return self._cached_response(request, *entry)
+        response = self.get_response(request)
+        if (getattr(response, 'page_cacheable', False)
+                and response.status_code == 200 and not response.cookies
+                and not request.user.is_authenticated):
+            headers = [(name, response[name]) for name in CACHED_HEADERS
+                       if response.has_header(name)]
+            cache.set(key, (response.content, headers), FEED_CACHE_TIMEOUT)
+        return response
+
+    def _cached_response(self, request, content, headers):
+        response = HttpResponse(content)
+        for name, value in headers:
+            response[name] = value
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
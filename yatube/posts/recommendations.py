@@ -0,0 +1,205 @@
+"""Рекомендации «на кого подписаться», посчитанные офлайн.
+
+Граф подписок и сообщества авторов собираются в разреженные матрицы
+scipy: F[u, a] -- u подписан на a, G[u, g] -- u писал в группу g.
+Для пачки читателей B оценки кандидатов складываются из трёх частей:
+
+* friends -- F[B] @ F: авторов читают те, кого читает пользователь;
+* co_following -- S @ F, где S -- самые похожие читатели по общим
+  подпискам (F[B] @ F.T без популярных авторов, на которых подписаны
+  почти все и которые сходства не говорят);
+* groups -- I[B] @ T: I -- группы, где пишет сам читатель и его
+  авторы, T -- самые активные авторы каждой группы.
+
+Лучшие RECOMMENDATIONS_COUNT кандидатов, на которых пользователь ещё
+не подписан, записываются в Recommendation; страницы читают только
+эту таблицу, а пересчёт увеличивает версию ленты recommendations.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from scipy import sparse
+
+from . import feed_cache
+from .models import Follow, Post, Recommendation, User
+
+RECOMMENDATIONS_COUNT = settings.RECOMMENDATIONS_COUNT
+FEED_FANOUT_LIMIT = settings.FEED_FANOUT_LIMIT
+RECOMMEND_BATCH_SIZE = 1000
+WEIGHTS = {
+    Recommendation.FRIENDS: 1.0,
+    Recommendation.CO_FOLLOWING: 0.5,
+    Recommendation.GROUPS: 0.2,
+}
+# Сколько похожих читателей учитывать в co_following.
+SIMILAR_READERS = 50
+# Сколько самых активных авторов группы рекомендовать по группам.
+GROUP_TOP_AUTHORS = 20
+
+
+def _pairs(rows):
+    """Массив (n, 2) из пар id, прочитанных потоком."""
+    flat = np.fromiter((value for row in rows.iterator() for value in row),
+                       dtype=np.int64)
+    return flat.reshape(-1, 2)
+
+
+def _binary(rows, cols, shape):
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape,
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def _top_per_row(matrix, limit):
+    """Оставляет в каждой строке limit наибольших значений."""
+    matrix = matrix.tocsr()
+    rows, cols, values = [], [], []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        data = matrix.data[start:end]
+        keep = np.argsort(-data, kind='stable')[:limit]
+        rows.append(np.full(len(keep), row))
+        cols.append(matrix.indices[start:end][keep])
+        values.append(data[keep])
+    if not rows:
+        return sparse.csr_matrix(matrix.shape, dtype=np.float32)
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows),
+                                  np.concatenate(cols))),
+        shape=matrix.shape,
+    )
+
+
+class FollowMatrices:
+    """Разреженные матрицы графа подписок и групп для всех
+    пользователей; строка и столбец -- индекс id в self.ids."""
+
+    def __init__(self):
+        self.ids = np.fromiter(
+            User.objects.order_by('pk').values_list('pk', flat=True)
+            .iterator(), dtype=np.int64,
+        )
+        size = len(self.ids)
+        # Пользователи, появившиеся после чтения id, в матрицы не входят.
+        last = int(self.ids[-1]) if size else 0
+        follows = self.index(_pairs(Follow.objects.filter(
+            user__lte=last, author__lte=last,
+        ).values_list('user', 'author')))
+        self.follows = _binary(follows[:, 0], follows[:, 1], (size, size))
+        followers = np.asarray(self.follows.sum(axis=0)).ravel()
+        # Подписки на популярных авторов не делают читателей похожими.
+        niche = sparse.diags((followers <= FEED_FANOUT_LIMIT)
+                             .astype(np.float32))
+        self.niche_follows_t = (self.follows @ niche).T.tocsr()
+
+        activity = np.array(list(
+            Post.objects.filter(group__isnull=False, author__lte=last)
+            .order_by()
+            .values('author', 'group').annotate(total=Count('pk'))
+            .values_list('author', 'group', 'total').iterator()
+        ), dtype=np.int64).reshape(-1, 3)
+        groups, group_index = np.unique(activity[:, 1], return_inverse=True)
+        authors = self.index(activity[:, 0])
+        shape = (size, len(groups))
+        self.posted = _binary(authors, group_index, shape)
+        # В каждой группе только самые активные авторы: иначе строка
+        # оценок по группам покрыла бы почти всех пишущих.
+        self.group_authors = _top_per_row(sparse.csr_matrix(
+            (activity[:, 2].astype(np.float32), (group_index, authors)),
+            shape=shape[::-1],
+        ), GROUP_TOP_AUTHORS)
+        self.group_authors.data[:] = 1
+
+    def index(self, pairs):
+        return np.searchsorted(self.ids, pairs)
+
+    def scores(self, start, end):
+        """Матрицы оценок по причинам для читателей с индексами
+        start..end-1."""
+        follows = self.follows[start:end]
+        similar = follows @ self.niche_follows_t
+        # Читатель не похож сам на себя.
+        similar = similar - similar.multiply(sparse.eye(
+            end - start, similar.shape[1], k=start, format='csr',
+        ))
+        similar.eliminate_zeros()
+        similar = _top_per_row(similar, SIMILAR_READERS)
+        interests = follows @ self.posted + self.posted[start:end]
+        interests.data[:] = 1
+        return follows, {
+            Recommendation.FRIENDS: follows @ self.follows,
+            Recommendation.CO_FOLLOWING: similar @ self.follows,
+            Recommendation.GROUPS: interests @ self.group_authors,
+        }
+
+
+def _recommendations(matrices, start, end, count):
+    """Строки (user_id, author_id, score, reason) для читателей с
+    индексами start..end-1."""
+    follows, parts = matrices.scores(start, end)
+    total = sum(WEIGHTS[reason] * part for reason, part in parts.items())
+    total = total.tocsr()
+    rows, cols, scores = [], [], []
+    for row in range(end - start):
+        begin, finish = total.indptr[row], total.indptr[row + 1]
+        candidates = total.indices[begin:finish]
+        values = total.data[begin:finish]
+        followed = follows.indices[follows.indptr[row]:
+                                   follows.indptr[row + 1]]
+        keep = ((values > 0) & (candidates != start + row)
+                & ~np.isin(candidates, followed))
+        candidates, values = candidates[keep], values[keep]
+        best = np.argsort(-values, kind='stable')[:count]
+        rows.append(np.full(len(best), row))
+        cols.append(candidates[best])
+        scores.append(values[best])
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    scores = np.concatenate(scores)
+    # Причина -- часть с наибольшим вкладом в оценку.
+    reasons = list(parts)
+    weighted = np.vstack([
+        WEIGHTS[reason] * np.asarray(parts[reason][rows, cols]).ravel()
+        for reason in reasons
+    ])
+    return list(zip(
+        matrices.ids[start + rows].tolist(),
+        matrices.ids[cols].tolist(),
+        scores.tolist(),
+        [reasons[index] for index in weighted.argmax(axis=0)],
+    ))
+
+
+def _write(user_ids, rows):
+    """Заменяет рекомендации читателей одним DELETE и executemany: ORM
+    на сотнях тысяч строк тратил бы время на создание объектов."""
+    table = Recommendation._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # id отсортированы: диапазон -- ровно читатели пачки.
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id BETWEEN %s AND %s',
+            [user_ids[0], user_ids[-1]],
+        )
+        cursor.executemany(
+            f'INSERT INTO {table} (user_id, author_id, score, reason) '
+            'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def recommend(batch_size=RECOMMEND_BATCH_SIZE, count=RECOMMENDATIONS_COUNT):
+    """Пересчитывает рекомендации всех пользователей пачками по
+    batch_size читателей. Возвращает число читателей и рекомендаций."""
+    matrices = FollowMatrices()
+    users = written = 0
+    for start in range(0, len(matrices.ids), batch_size):
+        end = min(start + batch_size, len(matrices.ids))
+        rows = _recommendations(matrices, start, end, count)
+        _write(matrices.ids[[start, end - 1]].tolist(), rows)
+        users += end - start
+        written += len(rows)
+    feed_cache.bump('recommendations')
+    return users, written
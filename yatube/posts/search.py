@@ -0,0 +1,305 @@
+import math
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import SearchTerm
+from .utils import bulk_insert
+
+SEARCH_RESULTS_LIMIT = settings.SEARCH_RESULTS_LIMIT
+COUNT_CACHE_TIMEOUT = settings.COUNT_CACHE_TIMEOUT
+FTS_TABLE = 'posts_search'
+SEARCH_BATCH_SIZE = 1000
+# Число документов для idf в индексе SearchTerm: считать его на каждый
+# запрос -- проход по всей таблице.
+DOCUMENTS_COUNT_KEY = 'search:documents'
+# Совпадение в тексте поста весит больше, чем в комментарии к нему.
+POST_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.0
+
+WORD_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'а без бы в во вот вы да для до же за и из или им их к как ко ли '
+    'мы на над не нет ни но о об он она они оно от по под при про с '
+    'со так то ты у уже что это я'.split()
+)
+
+# Стеммер Портера для русского языка (алгоритм Snowball).
+_RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+_PERFECTIVE = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+_REFLEXIVE = re.compile(r'(с[яь])$')
+_ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+_PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+_VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+_NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+_DERIVATIONAL = re.compile(
+    r'.*[^аеиоуыэюя]+[аеиоуыэюя]+[^аеиоуыэюя]+[аеиоуыэюя].*ость?$'
+)
+_SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа слова; слова не на кириллице только приводятся к нижнему
+    регистру."""
+    word = word.lower().replace('ё', 'е')
+    match = _RV.match(word)
+    if not match:
+        return word
+    start, rv = match.groups()
+    ending = _PERFECTIVE.sub('', rv, 1)
+    if ending == rv:
+        rv = _REFLEXIVE.sub('', rv, 1)
+        ending = _ADJECTIVE.sub('', rv, 1)
+        if ending != rv:
+            rv = _PARTICIPLE.sub('', ending, 1)
+        else:
+            ending = _VERB.sub('', rv, 1)
+            rv = _NOUN.sub('', rv, 1) if ending == rv else ending
+    else:
+        rv = ending
+    rv = re.sub(r'и$', '', rv)
+    if _DERIVATIONAL.match(rv):
+        rv = re.sub(r'ость?$', '', rv)
+    ending = re.sub(r'ь$', '', rv)
+    if ending == rv:
+        rv = re.sub(r'нн$', 'н', _SUPERLATIVE.sub('', rv, 1))
+    else:
+        rv = ending
+    return start + rv
+
+
+def tokenize(text):
+    """Основы значимых слов текста в порядке их появления."""
+    return [stem(word) for word in WORD_RE.findall(text.lower())
+            if word not in STOP_WORDS]
+
+
+@lru_cache(maxsize=None)
+def _sqlite_has_fts5():
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE fts USING fts5(body)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def fts_enabled(db=connection):
+    """Индекс хранится в таблице FTS5, а не в модели SearchTerm."""
+    return db.vendor == 'sqlite' and _sqlite_has_fts5()
+
+
+def create_fts_table(db=connection):
+    # Документ ищется по rowid (см. _rowid): условие по столбцу
+    # UNINDEXED просматривало бы всю таблицу.
+    with db.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'post_id UNINDEXED, post_text, comment_text, '
+            "tokenize='unicode61 remove_diacritics 0')"
+        )
+
+
+def drop_fts_table(db=connection):
+    with db.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _document(kind, pk):
+    return f'{kind}:{pk}'
+
+
+def _rowid(kind, pk):
+    """rowid документа в таблице FTS: посты чётные, комментарии нечётные."""
+    return pk * 2 + (kind == 'comment')
+
+
+def _fts_write(documents, db=connection):
+    """documents -- четвёрки (вид, id, id поста, основы слов)."""
+    rows = []
+    for kind, pk, post_id, terms in documents:
+        text = ' '.join(terms)
+        if kind == 'post':
+            rows.append((_rowid(kind, pk), post_id, text, ''))
+        else:
+            rows.append((_rowid(kind, pk), post_id, '', text))
+    with db.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, post_id, post_text, '
+            'comment_text) VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def _terms_write(documents, apps=global_apps):
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    bulk_insert(SearchTerm.objects, (
+        SearchTerm(term=term, document=_document(kind, pk),
+                   post_id=post_id, frequency=frequency)
+        for kind, pk, post_id, terms in documents
+        for term, frequency in Counter(terms).items()
+    ))
+    cache.delete(DOCUMENTS_COUNT_KEY)
+
+
+def _remove(kind, pk):
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [_rowid(kind, pk)])
+        return
+    SearchTerm.objects.filter(document=_document(kind, pk)).delete()
+    cache.delete(DOCUMENTS_COUNT_KEY)
+
+
+def _index(kind, pk, post_id, text):
+    _remove(kind, pk)
+    documents = [(kind, pk, post_id, tokenize(text))]
+    if fts_enabled():
+        _fts_write(documents)
+    else:
+        _terms_write(documents)
+
+
+def index_post(post):
+    _index('post', post.pk, post.pk, post.text)
+
+
+def index_comment(comment):
+    _index('comment', comment.pk, comment.post_id, comment.text)
+
+
+def _write_batches(documents, write):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == SEARCH_BATCH_SIZE:
+            write(batch)
+            batch = []
+    write(batch)
+
+
+def index_posts(posts):
+    """Индексирует пакетами новые посты; posts -- пары (id, текст)."""
+    _write_batches(
+        (('post', pk, pk, tokenize(text)) for pk, text in posts),
+        _fts_write if fts_enabled() else _terms_write,
+    )
+
+
+def remove_post(post):
+    """Убирает пост из индекса. Комментарии к нему удаляются каскадом
+    раньше поста и убираются каждый своим сигналом."""
+    _remove('post', post.pk)
+
+
+def remove_comment(comment):
+    _remove('comment', comment.pk)
+
+
+def _fts_search(terms, limit):
+    query = ' '.join(f'"{term}"' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT post_id, bm25({FTS_TABLE}, 0, %s, %s) AS score '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY score LIMIT %s',
+            [POST_WEIGHT, COMMENT_WEIGHT, query, limit],
+        )
+        # bm25 тем меньше, чем документ релевантнее.
+        return [(post_id, -score) for post_id, score in cursor.fetchall()]
+
+
+def _terms_search(terms):
+    rows = SearchTerm.objects.filter(term__in=terms).values_list(
+        'document', 'post_id', 'term', 'frequency'
+    )
+    documents = defaultdict(dict)
+    posts = {}
+    for document, post_id, term, frequency in rows:
+        documents[document][term] = frequency
+        posts[document] = post_id
+    total = cache.get(DOCUMENTS_COUNT_KEY)
+    if total is None:
+        total = SearchTerm.objects.values('document').distinct().count()
+        cache.set(DOCUMENTS_COUNT_KEY, total, COUNT_CACHE_TIMEOUT)
+    found = Counter(term for document in documents.values()
+                    for term in document)
+    idf = {term: math.log(1 + total / count) for term, count in found.items()}
+    results = []
+    for document, frequencies in documents.items():
+        if len(frequencies) < len(terms):
+            continue
+        weight = (POST_WEIGHT if document.startswith('post:')
+                  else COMMENT_WEIGHT)
+        results.append((posts[document], weight * sum(
+            (1 + math.log(frequency)) * idf[term]
+            for term, frequency in frequencies.items()
+        )))
+    return results
+
+
+def search_posts(query, limit=SEARCH_RESULTS_LIMIT):
+    """id постов, подходящих под запрос, от самых релевантных.
+
+    Пост подходит, если все слова запроса есть в его тексте или
+    в тексте одного из комментариев к нему; очки документов поста
+    складываются.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    if fts_enabled():
+        # Документов берём с запасом: у поста их может быть несколько.
+        matches = _fts_search(terms, limit * 2)
+    else:
+        matches = _terms_search(terms)
+    scores = Counter()
+    for post_id, score in matches:
+        scores[post_id] += score
+    return [post_id for post_id, _ in scores.most_common(limit)]
+
+
+def _all_documents(Post, Comment):
+    posts = Post.objects.values_list('pk', 'text')
+    for pk, text in posts.iterator(chunk_size=SEARCH_BATCH_SIZE):
+        yield 'post', pk, pk, tokenize(text)
+    comments = Comment.objects.values_list('pk', 'post', 'text')
+    for pk, post_id, text in comments.iterator(chunk_size=SEARCH_BATCH_SIZE):
+        yield 'comment', pk, post_id, tokenize(text)
+
+
+def rebuild(apps=global_apps, db=connection):
+    """Строит индекс заново по всем постам и комментариям."""
+    if fts_enabled(db):
+        with db.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+        def write(batch):
+            _fts_write(batch, db)
+    else:
+        apps.get_model('posts', 'SearchTerm').objects.all().delete()
+
+        def write(batch):
+            _terms_write(batch, apps)
+    _write_batches(_all_documents(apps.get_model('posts', 'Post'),
+                                  apps.get_model('posts', 'Comment')),
+                   write)
@@ -0,0 +1,187 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import counters, feed_cache, follows, search, tasks, thumbnails
+from .follow_graph import graph
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+# Поля, которые показывают ленты: их правка сбрасывает кэш лент.
+USER_LABELS = ('username', 'first_name', 'last_name')
+GROUP_LABELS = ('title', 'slug', 'description')
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+    instance._loaded_text = instance.__dict__.get('text')
+
+
+def _bump_post_feeds(post):
+    groups = {post.group_id, getattr(post, '_loaded_group_id', None)}
+    feed_cache.bump(
+        'index',
+        f'profile:{post.author_id}',
+        f'post:{post.pk}',
+        *(f'group:{group_id}' for group_id in groups if group_id),
+    )
+    post._loaded_group_id = post.group_id
+
+
+def _count_post_group(post, created):
+    old_group_id = None if created else post._loaded_group_id
+    if old_group_id != post.group_id:
+        if old_group_id:
+            counters.change_group(old_group_id, -1)
+        if post.group_id:
+            counters.change_group(post.group_id, 1)
+
+
+def _labels(instance, fields):
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+def _labels_changed(instance, fields, update_fields):
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return False
+    return _labels(instance, fields) != instance._loaded_labels
+
+
+def _user_feeds(user_id):
+    """Ленты, где видно имя пользователя: его профиль и посты, главная
+    с лентами подписок, группы с его постами и комментарии к постам."""
+    posts = Post.objects.filter(author=user_id).order_by()
+    return [
+        'index', f'profile:{user_id}',
+        *(f'group:{group_id}' for group_id in posts.filter(
+            group__isnull=False,
+        ).values_list('group', flat=True).distinct()),
+        *(f'post:{post_id}' for post_id in posts.values_list('pk',
+                                                             flat=True)),
+        *(f'comments:{post_id}' for post_id in Comment.objects.filter(
+            author=user_id,
+        ).order_by().values_list('post', flat=True).distinct()),
+    ]
+
+
+def _group_feeds(group_id):
+    """Ленты, где видно группу: её страница, главная с лентами подписок,
+    профили её авторов и страницы её постов."""
+    posts = Post.objects.filter(group=group_id).order_by()
+    return [
+        'index', f'group:{group_id}',
+        *(f'profile:{author_id}' for author_id in posts.values_list(
+            'author', flat=True,
+        ).distinct()),
+        *(f'post:{post_id}' for post_id in posts.values_list('pk',
+                                                             flat=True)),
+    ]
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._loaded_labels = _labels(instance, USER_LABELS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+    if not created and _labels_changed(instance, USER_LABELS,
+                                       update_fields):
+        feed_cache.bump(*_user_feeds(instance.pk))
+    instance._loaded_labels = _labels(instance, USER_LABELS)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # Посты, комментарии и подписки удаляются каскадом и сбрасывают
+    # свои ленты сами.
+    feed_cache.bump('index', f'profile:{instance.pk}')
+
+
+@receiver(post_init, sender=Group)
+def group_loaded(sender, instance, **kwargs):
+    instance._loaded_labels = _labels(instance, GROUP_LABELS)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not created and _labels_changed(instance, GROUP_LABELS,
+                                       update_fields):
+        feed_cache.bump(*_group_feeds(instance.pk))
+    instance._loaded_labels = _labels(instance, GROUP_LABELS)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления посты уже без группы: ленты собираются заранее.
+    instance._feeds = _group_feeds(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    feed_cache.bump(*instance._feeds)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        tasks.fan_out_post.enqueue({'post': instance.pk},
+                                   key=f'fan-out:{instance.pk}')
+    _count_post_group(instance, created)
+    _bump_post_feeds(instance)
+    if instance.image and (created
+                           or instance.image.name != instance._loaded_image):
+        thumbnails.schedule(instance.image.name)
+    instance._loaded_image = instance.image.name
+    if created or instance.text != instance._loaded_text:
+        tasks.index_posts.enqueue({'post': instance.pk})
+        instance._loaded_text = instance.text
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    if instance.group_id:
+        counters.change_group(instance.group_id, -1)
+    _bump_post_feeds(instance)
+    search.remove_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+    feed_cache.bump(f'comments:{instance.post_id}')
+    tasks.index_comments.enqueue({'comment': instance.pk})
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    feed_cache.bump(f'comments:{instance.post_id}')
+    search.remove_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, [instance.author_id])
+
+
+@receiver(request_started)
+def request_started_graph(sender, **kwargs):
+    graph.expire()
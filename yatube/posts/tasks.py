@@ -0,0 +1,47 @@
+"""Фоновые задачи постов: раскладка по лентам и поисковый индекс.
+
+Задачи получают id и перечитывают объекты: к моменту выполнения
+запись могла измениться или исчезнуть.
+"""
+from core.tasks import task
+
+from . import feed_cache, search, timeline
+from .models import Comment, Follow, Post
+
+
+@task
+def fan_out_post(post):
+    post = Post.objects.filter(pk=post).only('author', 'pub_date').first()
+    if post is None:
+        return
+    timeline.fan_out_post(post)
+    # Ленты подписок зависят от версии главной: после раскладки их
+    # кэш собирается заново.
+    feed_cache.bump('index')
+
+
+@task
+def add_authors(user, authors):
+    # Отписка могла случиться раньше, чем дошла очередь.
+    authors = list(Follow.objects.filter(user=user, author__in=authors)
+                   .values_list('author', flat=True))
+    if not authors:
+        return
+    timeline.add_authors(user, authors)
+    feed_cache.bump(f'follow:{user}')
+
+
+@task(batch=True)
+def index_posts(payloads):
+    for post in Post.objects.filter(
+        pk__in=[payload['post'] for payload in payloads]
+    ).only('text'):
+        search.index_post(post)
+
+
+@task(batch=True)
+def index_comments(payloads):
+    for comment in Comment.objects.filter(
+        pk__in=[payload['comment'] for payload in payloads]
+    ).only('post', 'text'):
+        search.index_comment(comment)
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.api import POST_FIELDS
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Ошибка выдачи лент в JSON"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.user.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.guest_client.get(url).json()
+                self.assertEqual(data['next'], None)
+                self.assertEqual(len(data['results']), 1)
+                result = data['results'][0]
+                self.assertEqual(set(result), set(POST_FIELDS))
+                self.assertEqual(result['id'], self.post.pk)
+                self.assertEqual(result['author'], 'auth')
+                self.assertEqual(result['group'], 'testslug')
+
+    def test_missing_objects(self):
+        """Ошибка ответа API для несуществующих объектов"""
+        urls = (
+            reverse('posts:api_group_list', args=('unknown',)),
+            reverse('posts:api_profile', args=('unknown',)),
+            reverse('posts:api_post_detail', args=(self.post.pk + 100,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_fields(self):
+        """Ошибка выбора полей"""
+        url = reverse('posts:api_index')
+        data = self.guest_client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(data['results'],
+                         [{'id': self.post.pk, 'text': 'Тестовый пост'}])
+        response = self.guest_client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pages(self):
+        """Ошибка постраничного вывода в API"""
+        for number in range(12):
+            Post.objects.create(author=self.user, text=f'Пост {number}')
+        url = reverse('posts:api_index')
+        first = self.guest_client.get(url, {'fields': 'id'}).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        second = self.guest_client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-pk')
+                      .values_list('pk', flat=True))
+        )
+        # Первая страница HTML по-прежнему с номерами страниц.
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_conditional_get(self):
+        """Ошибка ответа 304 для неизменившейся ленты"""
+        url = reverse('posts:api_index')
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_feed(self):
+        """Ошибка ленты подписок в API"""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.reader_client.get(url).json()['results'], [])
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['id'] for post in response.json()['results']],
+                         [self.post.pk])
+
+    def test_post_detail(self):
+        """Ошибка поста с комментариями в API"""
+        url = reverse('posts:api_post_detail', args=(self.post.pk,))
+        response = self.guest_client.get(url, {'fields': 'text,comments'})
+        self.assertEqual(response.json(), {
+            'text': 'Тестовый пост',
+            'comments': {'results': [], 'next': None, 'previous': None},
+        })
+        etag = response['ETag']
+        comment = Comment.objects.create(post=self.post, author=self.reader,
+                                         text='Комментарий')
+        response = self.guest_client.get(url, {'fields': 'text,comments'},
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments']['results'], [{
+            'id': comment.pk,
+            'author': 'reader',
+            'text': 'Комментарий',
+            'pub_date': comment.pub_date.isoformat(),
+        }])
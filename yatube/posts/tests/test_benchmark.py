@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import Comment, FeedItem, Follow, Post
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_and_measure(self):
+        """Ошибка засева данных и замера представлений"""
+        benchmark.seed(users=20, posts=60, comments=30, follows=40,
+                       groups=3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertTrue(FeedItem.objects.exists())
+        cache.set('configured', 1)
+        results = benchmark.measure(requests=2)
+        self.assertEqual(cache.get('configured'), 1)
+        self.assertEqual(set(results), set(benchmark.VIEWS))
+        for view, metrics in results.items():
+            with self.subTest(view=view):
+                self.assertGreater(metrics['queries'], 0)
+                self.assertGreater(metrics['peak_kib'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_measure_cards(self):
+        """Ошибка замера рендера карточки поста"""
+        benchmark.seed(users=5, posts=15, comments=0, follows=0, groups=2)
+        results = benchmark.measure_cards(repeats=3)
+        self.assertEqual(set(results), set(benchmark.CARD_TEMPLATES))
+        for metrics in results.values():
+            self.assertLessEqual(metrics['p50_us'], metrics['p99_us'])
+
+    def test_compare(self):
+        """Ошибка поиска регрессий относительно baseline"""
+        baseline = {'index': {'p50_ms': 10, 'queries': 3}}
+        self.assertEqual(benchmark.compare(
+            {'index': {'p50_ms': 11.9, 'queries': 3}}, baseline, 0.2
+        ), [])
+        self.assertEqual(benchmark.compare(
+            {'index': {'p50_ms': 12.5, 'queries': 4},
+             'profile': {'p50_ms': 100, 'queries': 10}}, baseline, 0.2
+        ), ['index.p50_ms: 10 -> 12.5', 'index.queries: 3 -> 4'])
+
+    def test_percentile(self):
+        """Ошибка расчёта перцентиля"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.5), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([7], 0.99), 7)
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class CardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth',
+                                            first_name='Лев')
+        cls.group = Group.objects.create(title='Группа', slug='slug')
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {number}')
+            for number in range(3)
+        )
+        cls.post_id = Post.objects.create(author=cls.user, group=cls.group,
+                                          text='Исходный текст').pk
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.get(pk=self.post_id)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_page_from_cache(self):
+        """Ошибка чтения карточек страницы одним запросом к кэшу"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        # Новый пост меняет версию ленты: страница собирается заново,
+        # а карточки прежних постов берутся из кэша.
+        Post.objects.create(author=self.user, text='Свежий пост')
+        with mock.patch.object(cards.cache, 'set_many',
+                               wraps=cards.cache.set_many) as set_many:
+            response = self.client.get(url)
+        self.assertContains(response, 'Свежий пост')
+        self.assertContains(response, 'Исходный текст')
+        set_many.assert_called_once()
+        self.assertEqual(len(set_many.call_args[0][0]), 1)
+
+    def test_variants(self):
+        """Ошибка вариантов карточки в разных лентах"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile', args=('auth',)))
+        self.client.get(reverse('posts:group_list', args=('slug',)))
+        for variant in ('feed', 'profile', 'group'):
+            with self.subTest(variant=variant):
+                self.assertIsNotNone(
+                    cache.get(cards.card_key(self.post, variant))
+                )
+        self.assertIn('/profile/auth/',
+                      cache.get(cards.card_key(self.post, 'feed')))
+        self.assertNotIn('/profile/auth/',
+                         cache.get(cards.card_key(self.post, 'profile')))
+        self.assertNotIn('/group/slug/',
+                         cache.get(cards.card_key(self.post, 'group')))
+
+    def test_edit_invalidates(self):
+        """Ошибка обновления карточки после правки поста"""
+        url = reverse('posts:profile', args=('auth',))
+        self.assertContains(self.client.get(url), 'Исходный текст')
+        old_key = cards.card_key(self.post, 'profile')
+        self.client.post(reverse('posts:post_edit', args=(self.post.pk,)),
+                         {'text': 'Новый текст'})
+        self.post.refresh_from_db()
+        self.assertNotEqual(cards.card_key(self.post, 'profile'), old_key)
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Исходный текст')
+
+    def test_thumbnail_in_key(self):
+        """Ошибка ключа карточки с готовой миниатюрой"""
+        key = cards.card_key(self.post, 'feed')
+        self.post.thumbnail = mock.Mock()
+        self.assertNotEqual(cards.card_key(self.post, 'feed'), key)
+
+    def test_rename_invalidates(self):
+        """Ошибка обновления карточки после переименования автора и
+        сообщества"""
+        url = reverse('posts:index')
+        self.group = Group.objects.get(pk=self.group.pk)
+        self.user = User.objects.get(pk=self.user.pk)
+        self.assertContains(self.client.get(url), '#Группа')
+        self.group.title = 'Клуб'
+        self.group.save()
+        self.user.username = 'writer'
+        self.user.save()
+        # Правка меняет версии лент, но не время изменения постов:
+        # старые карточки отсеивает только их ключ.
+        response = self.client.get(url)
+        self.assertContains(response, '#Клуб')
+        self.assertContains(response, '/profile/writer/')
+        self.assertNotContains(response, '#Группа')
+        self.assertNotContains(response, '/profile/auth/')
@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.user_2 = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='testslug2',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def counters(self, user):
+        counters = UserCounters.objects.get(user=user)
+        return (counters.posts_count, counters.followers_count,
+                counters.following_count)
+
+    def test_counters_follow_changes(self):
+        """Ошибка обновления счётчиков при изменениях"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.user_2, text='Текст')
+        Follow.objects.create(user=self.user_2, author=self.user)
+        self.assertEqual(self.counters(self.user), (1, 1, 0))
+        self.assertEqual(self.counters(self.user_2), (0, 0, 1))
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        post.group = self.group_2
+        post.save()
+        self.assertEqual(
+            list(Group.objects.order_by('pk')
+                 .values_list('posts_count', flat=True)),
+            [0, 1]
+        )
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertEqual(self.counters(self.user), (0, 0, 0))
+        self.assertEqual(self.counters(self.user_2), (0, 0, 0))
+        self.assertEqual(Group.objects.get(pk=self.group_2.pk).posts_count,
+                         0)
+
+    def test_recount_command(self):
+        """Ошибка пересчёта разошедшихся счётчиков"""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Пост', group=self.group)
+            for _ in range(3)
+        ])
+        Follow.objects.create(user=self.user_2, author=self.user)
+        UserCounters.objects.filter(user=self.user_2).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.user), (3, 1, 0))
+        self.assertEqual(self.counters(self.user_2), (0, 0, 1))
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 3)
+
+    def test_profile_uses_counters(self):
+        """Ошибка вывода счётчиков в профиле"""
+        Post.objects.create(author=self.user, text='Пост')
+        Follow.objects.create(user=self.user_2, author=self.user)
+        response = self.client.get(reverse('posts:profile',
+                                           args=(self.user.username,)))
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertContains(response, 'Подписчики: 1')
+        self.assertContains(response, 'Подписки: 0')
+
+    def test_missing_counters(self):
+        """Ошибка страниц автора без строки счётчиков"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        Follow.objects.create(user=self.user_2, author=self.user)
+        UserCounters.objects.filter(user=self.user).delete()
+        for name, url in (
+            ('posts:profile', (self.user.username,)),
+            ('posts:api_profile', (self.user.username,)),
+            ('posts:post_detail', (post.pk,)),
+        ):
+            with self.subTest(name=name):
+                cache.clear()
+                response = self.client.get(reverse(name, args=url))
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Всего постов автора: 1')
+        self.assertEqual(self.counters(self.user), (1, 1, 0))
+
+    def test_save_keeps_counters(self):
+        """Ошибка затирания счётчиков полным сохранением записи"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.user_2, text='Текст')
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        post.text = 'Новый текст'
+        post.save()
+        group.title = 'Новое имя'
+        group.save()
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(group.title, 'Новое имя')
+        self.assertEqual(group.posts_count, 2)
+
+    def test_recount_many_users(self):
+        """Ошибка пересчёта счётчиков сотен пользователей"""
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(600)
+        )
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(UserCounters.objects.count(), 602)
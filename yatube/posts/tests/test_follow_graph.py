@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.testing import OnCommitMixin
+from posts import feed_cache
+from posts.follow_graph import FollowGraph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(5)
+        )
+        cls.users = list(User.objects.order_by('pk'))
+        cls.ids = [user.pk for user in cls.users]
+        Follow.objects.bulk_create(
+            Follow(user=cls.users[0], author=author)
+            for author in cls.users[1:4]
+        )
+        Follow.objects.create(user=cls.users[4], author=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.graph = FollowGraph()
+
+    def test_queries(self):
+        """Ошибка ответов графа подписок"""
+        first, second, third, fourth, fifth = self.ids
+        with self.assertNumQueries(2):
+            self.graph.load(self.ids)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.graph.is_following(first, second))
+            self.assertFalse(self.graph.is_following(second, first))
+            self.assertEqual(self.graph.following(first),
+                             [second, third, fourth])
+            self.assertEqual(self.graph.followers(second), [first, fifth])
+            self.assertEqual(self.graph.following_count(first), 3)
+            self.assertEqual(self.graph.followers_count(second), 2)
+            self.assertEqual(self.graph.followers_count(first), 0)
+
+    def test_delta(self):
+        """Ошибка изменения графа подпиской этого процесса"""
+        first, second, _, _, fifth = self.ids
+        self.graph.load(self.ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user_id=fifth, author_id=first)
+        self.graph.changed(fifth, [first], True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(user=first, author=second).delete()
+        self.graph.changed(first, [second], False)
+        self.graph.expire()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.graph.is_following(fifth, first))
+            self.assertEqual(self.graph.followers(first), [fifth])
+            self.assertFalse(self.graph.is_following(first, second))
+            self.assertEqual(self.graph.followers(second), [fifth])
+
+    def test_external_change(self):
+        """Ошибка перезагрузки подписок, изменённых другим процессом"""
+        first, _, _, _, fifth = self.ids
+        self.graph.load(self.ids)
+        # Версии растут, а self.graph о подписке не знает, как граф
+        # другого процесса.
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user_id=fifth, author_id=first)
+        self.assertFalse(self.graph.is_following(fifth, first))
+        self.graph.expire()
+        # Загружается только запрошенное направление.
+        with self.assertNumQueries(1):
+            self.assertTrue(self.graph.is_following(fifth, first))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.graph.followers(first), [fifth])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }})
+    def test_without_cache(self):
+        """Ошибка графа подписок без кэша версий"""
+        first, second, _, _, fifth = self.ids
+        # Версии, заведённые в одну миллисекунду, совпадают.
+        with mock.patch.object(feed_cache, '_new_version', return_value=1):
+            self.graph.load(self.ids)
+            Follow.objects.create(user_id=second, author_id=first)
+            self.graph.expire()
+            self.assertEqual(self.graph.followers(first), [second])
+            Follow.objects.create(user_id=fifth, author_id=first)
+            self.graph.changed(fifth, [first], True)
+            self.graph.expire()
+            with self.assertNumQueries(1):
+                self.assertTrue(self.graph.is_following(fifth, first))
@@ -0,0 +1,160 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import OnCommitMixin
+from posts import feed_cache
+from posts.follow_graph import graph
+from posts.models import FeedItem, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class FollowBulkTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(3)]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def bulk(self, client=None, **data):
+        return (client or self.client).post(
+            reverse('posts:api_follow_bulk'), json.dumps(data),
+            content_type='application/json',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.values_list(
+            'followers_count', 'following_count',
+        ).get(user=user)
+
+    def statements(self, queries, verb, model=Follow):
+        table = model._meta.db_table
+        return [query for query in queries
+                if query['sql'].startswith(verb)
+                and table in query['sql'].split(' WHERE ')[0]]
+
+    def test_unfollow_own_follow(self):
+        """Ошибка отписки от чужой подписки на того же автора"""
+        author = self.authors[0]
+        Follow.objects.create(user=self.other, author=author)
+        url = reverse('posts:profile_unfollow', args=(author.username,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertTrue(Follow.objects.filter(user=self.other).exists())
+        Follow.objects.create(user=self.reader, author=author)
+        self.client.get(url)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        self.assertTrue(Follow.objects.filter(user=self.other).exists())
+
+    def test_bulk_follow(self):
+        """Ошибка подписки пачкой"""
+        first, second, third = self.authors
+        Follow.objects.create(user=self.reader, author=first)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk(follow=[
+                first.username, second.username, third.username,
+                'reader', 'nobody',
+            ])
+        self.assertEqual(response.json(), {
+            'followed': ['author1', 'author2'],
+            'unfollowed': [],
+            'unknown': ['nobody'],
+        })
+        self.assertEqual(len([
+            query for query in self.statements(queries, 'SELECT', User)
+            if '"username" IN' in query['sql']
+        ]), 1)
+        self.assertEqual(len(self.statements(queries, 'INSERT')), 1)
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.reader)
+                .values_list('author', flat=True)),
+            {first.pk, second.pk, third.pk},
+        )
+        self.assertEqual(self.counters(self.reader), (0, 3))
+        self.assertEqual(self.counters(second), (1, 0))
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 3)
+        graph.expire()
+        self.assertEqual(graph.following(self.reader.pk),
+                         [first.pk, second.pk, third.pk])
+
+    def test_bulk_unfollow(self):
+        """Ошибка отписки пачкой"""
+        first, second, third = self.authors
+        with self.captureOnCommitCallbacks(execute=True):
+            for author in (first, second):
+                Follow.objects.create(user=self.reader, author=author)
+                Follow.objects.create(user=self.other, author=author)
+        self.assertTrue(graph.is_following(self.reader.pk, first.pk))
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.bulk(unfollow=[
+                first.username, second.username, third.username,
+            ])
+        self.assertEqual(response.json()['unfollowed'],
+                         ['author0', 'author1'])
+        self.assertEqual(len(self.statements(queries, 'DELETE')), 1)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        self.assertEqual(Follow.objects.filter(user=self.other).count(), 2)
+        self.assertEqual(self.counters(self.reader), (0, 0))
+        self.assertEqual(self.counters(first), (1, 0))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        graph.expire()
+        self.assertFalse(graph.is_following(self.reader.pk, first.pk))
+        self.assertEqual(graph.followers(first.pk), [self.other.pk])
+
+    @override_settings(TASKS_EAGER=False)
+    def test_bump_after_commit(self):
+        """Ошибка смены версий лент подписок до фиксации транзакции"""
+        feeds = ('follow:{}', 'follows:{}')
+        feeds = [feed.format(user.pk) for feed in feeds
+                 for user in (self.reader, self.authors[0])]
+        versions = feed_cache.get_versions(*feeds)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.bulk(follow=[self.authors[0].username])
+            self.assertEqual(feed_cache.get_versions(*feeds), versions)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            [old != new for old, new in
+             zip(versions, feed_cache.get_versions(*feeds))],
+            [True, False, True, True],
+        )
+
+    def test_follow_prolific_author(self):
+        """Ошибка подписки на автора с сотнями постов"""
+        author = self.authors[0]
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}') for number in range(600)
+        )
+        self.bulk(follow=[author.username])
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(),
+                         601)
+
+    def test_bulk_errors(self):
+        """Ошибка проверки запроса подписки пачкой"""
+        self.assertEqual(self.bulk(Client(), follow=['author0']).status_code,
+                         401)
+        self.assertEqual(
+            self.client.get(reverse('posts:api_follow_bulk')).status_code,
+            405,
+        )
+        for data in ({'follow': 'author0'}, {'unfollow': [1]},
+                     {'follow': ['author0'] * 101}):
+            with self.subTest(data=data):
+                self.assertEqual(self.bulk(**data).status_code, 400)
+        self.assertFalse(Follow.objects.exists())
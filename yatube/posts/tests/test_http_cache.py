@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import OnCommitMixin
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class HttpCacheTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост',
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertChanged(self, client, url, etag):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_anonymous_headers(self):
+        """Ошибка заголовков кэширования для анонима"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=60', response['Cache-Control'])
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('public', response['Cache-Control'])
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_freshness_checked_before_query(self):
+        """Ошибка: ответ 304 строится с запросами к постам"""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_authorized_headers(self):
+        """Ошибка заголовков кэширования для пользователя"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                anonymous_etag = self.guest_client.get(url)['ETag']
+                response = self.reader_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertFalse(response.has_header('Last-Modified'))
+                self.assertNotEqual(response['ETag'], anonymous_etag)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_events_change_etag(self):
+        """Ошибка: ETag не меняется после изменений на странице"""
+        index, group, profile, detail = self.urls
+        etags = {url: self.reader_client.get(url)['ETag']
+                 for url in self.urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.user)
+        etags[profile] = self.assertChanged(self.reader_client, profile,
+                                            etags[profile])
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        etags[detail] = self.assertChanged(self.reader_client, detail,
+                                           etags[detail])
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Новый пост')
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertChanged(self.reader_client, url, etags[url])
+
+    def test_missing_pages(self):
+        """Ошибка ответа для несуществующих страниц"""
+        urls = (
+            reverse('posts:group_list', args=('unknown',)),
+            reverse('posts:profile', args=('unknown',)),
+            reverse('posts:post_detail', args=(self.post.pk + 100,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }})
+    def test_without_cache(self):
+        """Ошибка ответа лент без кэша"""
+        for url in (*self.urls, reverse('posts:api_index')):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertChanged(self.guest_client, url, response['ETag'])
+
+    def test_head(self):
+        """Ошибка ответа на HEAD"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.head(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('ETag'))
+
+    def test_new_csrf_token_changes_etag(self):
+        """Ошибка: 304 оставляет форму со старым токеном CSRF"""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.reader_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Так выглядит новый вход: токен CSRF заводится заново.
+        del self.reader_client.cookies[settings.CSRF_COOKIE_NAME]
+        self.assertChanged(self.reader_client, url, etag)
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase
+
+from posts import benchmark, loadtest
+from posts.models import Comment, Post
+from yatube.wsgi import application
+
+
+class LoadTestTests(TransactionTestCase):
+    # Потоки прогона ходят в базу своими соединениями и не видят
+    # данных в незакоммиченной транзакции TestCase.
+    def setUp(self):
+        cache.clear()
+        benchmark.seed(users=10, posts=30, comments=10, follows=20,
+                       groups=2)
+
+    def test_write_mix(self):
+        """Ошибка прогона смеси с записью"""
+        posts = Post.objects.count()
+        comments = Comment.objects.count()
+        data = loadtest.Runner(application, threads=1, requests=60,
+                               sessions=3).run()
+        self.assertEqual(data['total']['requests'], 60)
+        scenarios = data['scenarios']
+        for name in ('post_create', 'add_comment'):
+            with self.subTest(name=name):
+                self.assertEqual(set(scenarios[name]['statuses']), {'302'})
+        self.assertEqual(
+            Post.objects.count(),
+            posts + scenarios['post_create']['requests'],
+        )
+        self.assertEqual(
+            Comment.objects.count(),
+            comments + scenarios['add_comment']['requests'],
+        )
+
+    def test_threads(self):
+        """Ошибка прогона в несколько потоков"""
+        mix = {'index': 2, 'post_detail': 1, 'api_scroll': 1,
+               'follow_index': 1}
+        data = loadtest.Runner(application, mix, threads=3, requests=45,
+                               sessions=3).run()
+        self.assertEqual(set(data['scenarios']), set(mix))
+        self.assertEqual(data['total']['requests'], 45)
+        self.assertEqual(data['total']['errors'], 0)
+        self.assertEqual(sum(data['total']['histogram'].values()), 45)
+        self.assertIn('index:', loadtest.format_report(data))
+
+    def test_unknown_scenario(self):
+        """Ошибка проверки смеси сценариев"""
+        with self.assertRaises(ValueError):
+            loadtest.Runner(application, {'unknown': 1})
+
+
+class HistogramTests(SimpleTestCase):
+    def test_histogram(self):
+        """Ошибка раскладки задержек по корзинам"""
+        buckets = loadtest.histogram([0.5, 1, 1.5, 7, 10000])
+        self.assertEqual(buckets['<=1'], 2)
+        self.assertEqual(buckets['<=2'], 1)
+        self.assertEqual(buckets['<=10'], 1)
+        self.assertEqual(buckets['>5000'], 1)
+        self.assertEqual(sum(buckets.values()), 5)
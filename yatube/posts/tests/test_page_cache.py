@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import OnCommitMixin
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост',
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_anonymous_page_from_cache(self):
+        """Ошибка выдачи анониму страницы целиком из кэша"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                content = self.guest_client.get(url).content
+                # Остаётся только поиск ленты по адресу: группы по slug,
+                # автора по имени.
+                with self.assertNumQueries(0 if url == self.urls[0] else 1):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.content, content)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertEqual(response['X-Frame-Options'], 'SAMEORIGIN')
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_personal_holes(self):
+        """Ошибка личных фрагментов в общем каркасе страницы"""
+        self.guest_client.get(self.urls[3])
+        response = self.reader_client.get(self.urls[3])
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertNotContains(response, '<!--hole:')
+        response = self.author_client.get(self.urls[3])
+        self.assertContains(response, 'Пользователь: auth')
+        self.assertContains(response, 'редактировать запись')
+        response = self.guest_client.get(self.urls[3])
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertContains(response, 'Войти')
+
+    def test_logged_in_skeleton(self):
+        """Ошибка повторного использования каркаса для пользователя"""
+        url = self.urls[0]
+        self.reader_client.get(url)
+        with self.assertNumQueries(2):
+            # Сессия и пользователь; ленту берём из каркаса.
+            response = self.reader_client.get(url)
+        self.assertContains(response, 'Избранные авторы')
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_invalidation(self):
+        """Ошибка сброса кэша страниц при изменении лент"""
+        for url in self.urls:
+            self.guest_client.get(url)
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Новый пост')
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новый пост')
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Новый комментарий')
+        self.assertContains(self.guest_client.get(self.urls[3]),
+                            'Новый комментарий')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(self.guest_client.get(self.urls[2]),
+                            'Подписчики: 1')
+        response = self.reader_client.get(self.urls[2])
+        self.assertContains(response, 'Отписаться')
+
+    def test_group_edit(self):
+        """Ошибка сброса кэша страниц после правки группы"""
+        api_url = reverse('posts:api_index')
+        for url in (*self.urls, api_url):
+            self.guest_client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое имя'
+        group.slug = 'newslug'
+        group.description = 'Новое описание'
+        group.save()
+        group_url = reverse('posts:group_list', args=('newslug',))
+        self.assertContains(self.guest_client.get(group_url),
+                            'Новое описание')
+        for url in (self.urls[0], self.urls[2], self.urls[3]):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, '#Новое имя')
+                self.assertNotContains(response, '/group/testslug/')
+        self.assertEqual(
+            self.guest_client.get(api_url).json()['results'][0]['group'],
+            'newslug',
+        )
+
+    def test_author_edit(self):
+        """Ошибка сброса кэша страниц после правки имени автора"""
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий автора')
+        for url in self.urls:
+            self.guest_client.get(url)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        for url in self.urls[2:]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url),
+                                    'Лев Толстой')
+        author.username = 'leo'
+        author.save()
+        for url in (*self.urls[:2], self.urls[3]):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, '/profile/leo/')
+                self.assertNotContains(response, '/profile/auth/')
+
+    def test_login_keeps_cache(self):
+        """Ошибка сброса кэша страниц при входе пользователя"""
+        self.guest_client.get(self.urls[2])
+        user = User.objects.get(pk=self.user.pk)
+        user.save(update_fields=['last_login'])
+        user.save()
+        with self.assertNumQueries(1):
+            self.guest_client.get(self.urls[2])
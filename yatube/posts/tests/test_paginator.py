@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.utils import WindowPaginator
+
+User = get_user_model()
+
+
+class WindowPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number}')
+            for number in range(25)
+        )
+        cls.posts = Post.objects.order_by('-pub_date', '-pk')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_window(self):
+        """Ошибка окна номеров страниц"""
+        paginator = WindowPaginator(range(1000), 10)
+        self.assertEqual(paginator.window(50),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(paginator.window(2), [1, 2, 3, 4, None, 100])
+        self.assertEqual(WindowPaginator([], 10).window(1), [1])
+
+    def test_low_estimate(self):
+        """Ошибка постраничного вывода при заниженной оценке"""
+        paginator = WindowPaginator(self.posts, 10, lambda: 0)
+        page = paginator.get_page(2)
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        page = paginator.get_page(3)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.count, 25)
+
+    def test_high_estimate(self):
+        """Ошибка постраничного вывода при завышенной оценке"""
+        paginator = WindowPaginator(self.posts, 10, lambda: 1000)
+        self.assertEqual(paginator.num_pages, 100)
+        page = paginator.get_page(50)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_bounded_links(self):
+        """Ошибка числа ссылок на страницы в шаблоне"""
+        cache.set('count:index', 10 ** 6)
+        with CaptureQueriesContext(connection) as context:
+            response = Client().get(reverse('posts:index'), {'page': 2})
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in context.captured_queries))
+        self.assertEqual(response.context['page_obj'].page_window,
+                         [1, 2, 3, 4, None, 100000])
+        self.assertContains(response, 'page=100000')
+        self.assertNotContains(response, 'page=5"')
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FEED_TABLES = ('posts_post', 'posts_comment', 'posts_feeditem',
+               'posts_follow')
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент читают индекс и не сортируют во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for number in range(12):
+            post = Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}',
+            )
+        for number in range(22):
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {number}',
+            )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.reader_client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT')
+                and any(table in query['sql'] for table in FEED_TABLES)]
+
+    def test_feed_queries_use_indexes(self):
+        """Ошибка плана запроса ленты"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            first_page = self.reader_client.get(url).context
+            page = first_page.get('page_obj') or first_page.get('comments')
+            for data in (None, {'page': 2}, {'after': page.next_cursor},
+                         {'before': page.next_cursor}):
+                for sql in self.feed_queries(url, data):
+                    plan = query_plan(sql)
+                    with self.subTest(url=url, data=data, sql=sql):
+                        self.assertFalse(
+                            any('TEMP B-TREE' in step for step in plan), plan
+                        )
+                        self.assertFalse(
+                            any(step.startswith('SCAN') and 'INDEX' not in step
+                                for step in plan), plan
+                        )
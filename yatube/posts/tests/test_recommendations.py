@@ -0,0 +1,118 @@
+import io
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import OnCommitMixin
+from posts import recommendations
+from posts.models import Follow, Group, Post, Recommendation
+
+User = get_user_model()
+
+
+class RecommendationTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'friend_author', 'shared', 'twin',
+                 'twin_author', 'group_author')
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in names}
+        for user, author in (('reader', 'friend'),
+                             ('friend', 'friend_author'),
+                             ('reader', 'shared'),
+                             ('twin', 'shared'),
+                             ('twin', 'twin_author')):
+            Follow.objects.create(user=cls.users[user],
+                                  author=cls.users[author])
+        group = Group.objects.create(title='Группа', slug='slug')
+        for name in ('friend', 'group_author'):
+            Post.objects.create(author=cls.users[name], group=group,
+                                text='Пост в группе')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users['reader'])
+
+    def recommended(self, name):
+        return dict(Recommendation.objects.filter(
+            user=self.users[name],
+        ).values_list('author__username', 'reason'))
+
+    def test_recommend(self):
+        """Ошибка расчёта рекомендаций"""
+        users, written = recommendations.recommend(batch_size=3)
+        self.assertEqual(users, len(self.users))
+        self.assertEqual(written, Recommendation.objects.count())
+        self.assertEqual(self.recommended('reader'), {
+            'friend_author': Recommendation.FRIENDS,
+            'twin_author': Recommendation.CO_FOLLOWING,
+            'group_author': Recommendation.GROUPS,
+        })
+        self.assertNotIn('twin', self.recommended('twin'))
+
+    def test_recompute(self):
+        """Ошибка замены рекомендаций при пересчёте"""
+        recommendations.recommend()
+        Follow.objects.create(user=self.users['reader'],
+                              author=self.users['friend_author'])
+        output = io.StringIO()
+        call_command('recommend_authors', '--count', '1', stdout=output)
+        self.assertIn('для 7 пользователей', output.getvalue())
+        self.assertEqual(self.recommended('reader'),
+                         {'twin_author': Recommendation.CO_FOLLOWING})
+
+    def test_pages(self):
+        """Ошибка вывода рекомендаций на страницах"""
+        recommendations.recommend()
+        follow_url = reverse('posts:follow_index')
+        profile_url = reverse('posts:profile', args=('friend_author',))
+        self.assertContains(self.client.get(follow_url),
+                            '/profile/friend_author/')
+        response = self.client.get(profile_url)
+        self.assertContains(response, '/profile/twin_author/')
+        self.assertNotContains(response, '/profile/friend_author/"')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('posts:profile_follow',
+                                    args=('friend_author',)))
+        self.assertNotContains(self.client.get(follow_url),
+                               '/profile/friend_author/')
+        self.assertNotContains(Client().get(profile_url), 'На кого')
+
+    def test_profile_etag(self):
+        """Ошибка ETag профиля после пересчёта и подписки читателя"""
+        url = reverse('posts:profile', args=('friend_author',))
+        etag = self.client.get(url)['ETag']
+        recommendations.recommend()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '/profile/twin_author/')
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('posts:profile_follow',
+                                    args=('twin_author',)))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotContains(response, '/profile/twin_author/')
+
+    def test_users_added_during_recompute(self):
+        """Ошибка пересчёта с пользователями, появившимися после чтения
+        id"""
+        pairs = recommendations._pairs
+
+        def late_pairs(rows):
+            late = User.objects.create_user(username='late')
+            Follow.objects.create(user=late, author=self.users['shared'])
+            Follow.objects.create(user=self.users['reader'], author=late)
+            Post.objects.create(author=late, group=Group.objects.get(),
+                                text='Поздний пост')
+            return pairs(rows)
+
+        with mock.patch.object(recommendations, '_pairs',
+                               side_effect=late_pairs):
+            users, _ = recommendations.recommend()
+        self.assertEqual(users, len(self.users))
+        self.assertNotIn('late', self.recommended('twin'))
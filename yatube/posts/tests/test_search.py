@@ -0,0 +1,144 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, SearchTerm
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.cat_post = Post.objects.create(
+            author=self.user,
+            text='Кошки спят на тёплых подоконниках',
+        )
+        self.dog_post = Post.objects.create(
+            author=self.user,
+            text='Собака гуляла во дворе',
+        )
+        Comment.objects.create(
+            post=self.dog_post,
+            author=self.user,
+            text='А наша кошка боится собак',
+        )
+
+    def test_stem(self):
+        """Ошибка выделения основы русских слов"""
+        for words in (('кошка', 'кошки', 'кошками'),
+                      ('собака', 'собак', 'собаке'),
+                      ('гулять', 'гуляла', 'гуляли')):
+            with self.subTest(words=words):
+                self.assertEqual(len({search.stem(word) for word in words}),
+                                 1)
+        self.assertEqual(search.stem('Django'), 'django')
+
+    def test_search_ranks_posts(self):
+        """Ошибка поиска и ранжирования по постам и комментариям"""
+        self.assertEqual(search.search_posts('кошкой'),
+                         [self.cat_post.pk, self.dog_post.pk])
+        self.assertEqual(search.search_posts('собаки'), [self.dog_post.pk])
+        self.assertEqual(search.search_posts('кошки во дворе'), [])
+        self.assertEqual(search.search_posts('и на'), [])
+
+    def test_index_follows_changes(self):
+        """Ошибка обновления индекса при изменении и удалении"""
+        self.cat_post.text = 'Попугай кричит'
+        self.cat_post.save()
+        self.assertEqual(search.search_posts('кошки'), [self.dog_post.pk])
+        self.assertEqual(search.search_posts('попугаи'), [self.cat_post.pk])
+        self.dog_post.comments.all().delete()
+        self.assertEqual(search.search_posts('кошки'), [])
+        self.dog_post.delete()
+        self.assertEqual(search.search_posts('собака'), [])
+
+    def test_search_page(self):
+        """Ошибка страницы поиска"""
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'кошки'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.cat_post, self.dog_post])
+        response = self.guest_client.get(reverse('posts:search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_remove_by_rowid(self):
+        """Ошибка удаления документа из индекса без просмотра таблицы"""
+        with CaptureQueriesContext(connection) as context:
+            self.cat_post.delete()
+        deletes = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(f'DELETE FROM {search.FTS_TABLE}')
+        ]
+        self.assertEqual(len(deletes), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {deletes[0]}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('INDEX 0:=', plan)
+        self.assertEqual(search.search_posts('кошки'), [self.dog_post.pk])
+
+    def test_rebuild_command(self):
+        """Ошибка перестроения индекса командой"""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search.search_posts('собак'), [self.dog_post.pk])
+
+
+@mock.patch('posts.search.fts_enabled', return_value=False)
+class TermIndexTests(TestCase):
+    """Инвертированный индекс на модели, если в SQLite нет FTS5."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_term_index(self, fts_enabled):
+        """Ошибка поиска по индексу в модели SearchTerm"""
+        cat_post = Post.objects.create(author=self.user,
+                                       text='Кошка и ещё одна кошка')
+        dog_post = Post.objects.create(author=self.user, text='Собака')
+        comment = Comment.objects.create(post=dog_post, author=self.user,
+                                         text='Похожа на кошку')
+        self.assertEqual(
+            SearchTerm.objects.get(post=cat_post, term='кошк').frequency, 2
+        )
+        self.assertEqual(search.search_posts('кошки'),
+                         [cat_post.pk, dog_post.pk])
+        self.assertEqual(search.search_posts('кошки собаки'), [])
+        comment.delete()
+        self.assertEqual(search.search_posts('кошки'), [cat_post.pk])
+        search.rebuild()
+        self.assertEqual(search.search_posts('собака'), [dog_post.pk])
+        cat_post.delete()
+        self.assertEqual(search.search_posts('кошки'), [])
+
+    def test_documents_count_cached(self, fts_enabled):
+        """Ошибка подсчёта документов индекса на каждый запрос"""
+        Post.objects.create(author=self.user, text='Кошка')
+        search.search_posts('кошки')
+        with self.assertNumQueries(1):
+            search.search_posts('кошки')
+
+    def test_many_terms(self, fts_enabled):
+        """Ошибка записи сотен слов одного поста в индекс"""
+        post = Post.objects.create(author=self.user, text=' '.join(
+            f'слово{number}' for number in range(600)
+        ))
+        self.assertEqual(SearchTerm.objects.filter(post=post).count(), 600)
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @mock.patch('posts.thumbnails._submit')
+    def test_placeholder_until_ready(self, submit):
+        """Ошибка заглушки вместо несозданной миниатюры"""
+        post = self.create_post()
+        cache.clear()
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio')
+        self.assertNotContains(response, '<img class="card-img')
+        submit.assert_called_once_with(post.image.name)
+        etag = response['ETag']
+        thumbnails._generate(post.image.name)
+        # Готовая миниатюра сбрасывает кэш страниц: заглушка не остаётся
+        # ни в кэше, ни у клиента по ETag.
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail', args=(post.pk,))):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, '<img class="card-img')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_created_on_save(self):
+        """Ошибка создания миниатюры при сохранении поста"""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            post = self.create_post()
+        thumbnails.prefetch_thumbnails([post])
+        self.assertIsNotNone(post.thumbnail)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_prefetch_is_batched(self):
+        """Ошибка пакетного чтения миниатюр страницы"""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            posts = [self.create_post() for _ in range(5)]
+        posts = list(Post.objects.filter(pk__in=[post.pk for post in posts]))
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch_thumbnails(posts)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch_thumbnails(posts)
+        self.assertTrue(all(post.thumbnail.url for post in posts))
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_follow_fills_timeline(self):
+        """Ошибка наполнения ленты при подписке и новом посте"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post', flat=True)),
+            {self.old_post.pk, new_post.pk}
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, self.old_post])
+
+    def test_unfollow_clears_timeline(self):
+        """Ошибка очистки ленты при отписке"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    @mock.patch('posts.timeline.FEED_FANOUT_LIMIT', 0)
+    def test_popular_author_pulled_on_read(self):
+        """Ошибка чтения постов популярного автора из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedItem.objects.filter(post=new_post).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, self.old_post])
+
+    @mock.patch('posts.timeline.FEED_FANOUT_LIMIT', 0)
+    def test_late_post_of_popular_author(self):
+        """Ошибка подтягивания запоздавшего поста популярного автора"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        fresh_post = Post.objects.create(author=other, text='Свежий пост')
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        late_post = Post.objects.create(author=self.author, text='Запоздал')
+        Post.objects.filter(pk=late_post.pk).update(
+            pub_date=self.old_post.pub_date
+            + (fresh_post.pub_date - self.old_post.pub_date) / 2
+        )
+        response = self.reader_client.get(url)
+        self.assertEqual(list(response.context['page_obj']),
+                         [fresh_post, late_post, self.old_post])
+
+    @mock.patch('posts.timeline.FEED_FANOUT_LIMIT', 0)
+    def test_pull_on_cache_miss(self):
+        """Ошибка подтягивания постов при чтении ленты из кэша"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        with mock.patch('posts.feeds.pull_popular') as pull_popular:
+            self.reader_client.get(url)
+        pull_popular.assert_not_called()
+
+    def test_follow_prolific_author(self):
+        """Ошибка наполнения ленты постами автора с сотнями постов"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(600)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(),
+                         601)
@@ -0,0 +1,210 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from posts import search, transfer
+from posts.models import FeedItem, Follow, Group, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def jsonl(self, *records):
+        return io.StringIO(''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ))
+
+    def test_import(self):
+        """Ошибка загрузки постов пакетами"""
+        source = self.jsonl(
+            {'author': 'auth', 'group': 'testslug', 'text': 'Первый пост',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'author': 'auth', 'text': 'Второй пост'},
+            {'author': 'reader', 'group': 'testslug', 'text': 'Третий'},
+        )
+        self.assertEqual(transfer.import_posts(source, batch_size=2), 3)
+        post = Post.objects.get(text='Первый пост')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date,
+                         datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.user.counters.refresh_from_db()
+        self.assertEqual(self.user.counters.posts_count, 2)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post__text', flat=True)),
+            {'Первый пост', 'Второй пост'},
+        )
+        self.assertEqual(search.search_posts('второй'),
+                         [Post.objects.get(text='Второй пост').pk])
+        # Дата из файла не подменяется и у постов, созданных потом.
+        self.assertGreater(
+            Post.objects.create(author=self.user, text='Новый').pub_date,
+            post.pub_date,
+        )
+
+    def test_pub_date_field_untouched(self):
+        """Ошибка: импорт меняет поле pub_date для всего процесса"""
+        read_records = transfer.read_records
+        field = Post._meta.get_field('pub_date')
+
+        def checked(*args, **kwargs):
+            for item in read_records(*args, **kwargs):
+                self.assertTrue(field.auto_now_add)
+                yield item
+
+        with mock.patch('posts.transfer.read_records', checked):
+            transfer.import_posts(self.jsonl(
+                {'author': 'auth', 'text': 'Первый пост',
+                 'pub_date': '2020-01-02T03:04:05+00:00'},
+                {'author': 'auth', 'text': 'Второй пост'},
+            ))
+        self.assertEqual(Post.objects.get(text='Первый пост').pub_date,
+                         datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+
+    @mock.patch('posts.timeline.FEED_FANOUT_LIMIT', 0)
+    def test_popular_author_not_fanned_out(self):
+        """Ошибка раскладки импортированных постов популярного автора"""
+        transfer.import_posts(self.jsonl({'author': 'auth', 'text': 'Пост'}))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    def test_import_errors(self):
+        """Ошибка отказа в загрузке неверных записей"""
+        sources = (
+            self.jsonl({'author': 'auth', 'text': 'Пост'},
+                       {'author': 'unknown', 'text': 'Пост'}),
+            self.jsonl({'author': 'auth', 'group': 'unknown',
+                        'text': 'Пост'}),
+            self.jsonl({'author': 'auth', 'text': 'Пост',
+                        'pub_date': 'вчера'}),
+            self.jsonl({'author': 'auth', 'text': 'Пост',
+                        'image': 'missing.gif'}),
+            io.StringIO('{"author": "auth"\n'),
+        )
+        for source in sources:
+            with self.subTest(source=source.getvalue()):
+                with self.assertRaisesRegex(transfer.TransferError,
+                                            r'^Строка \d+: '):
+                    transfer.import_posts(source, batch_size=1)
+        self.assertFalse(Post.objects.exists())
+
+    def test_create_missing(self):
+        """Ошибка создания неизвестных авторов и групп"""
+        transfer.import_posts(
+            self.jsonl({'author': 'new', 'group': 'new-group',
+                        'text': 'Пост'}),
+            create_missing=True,
+        )
+        post = Post.objects.select_related('author', 'group').get()
+        self.assertEqual(post.author.username, 'new')
+        self.assertEqual(post.group.slug, 'new-group')
+        self.assertEqual(post.author.counters.posts_count, 1)
+
+    def test_images(self):
+        """Ошибка загрузки изображений по пути"""
+        images_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, images_dir, ignore_errors=True)
+        with open(os.path.join(images_dir, 'small.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'media.gif'),
+                  'wb') as image:
+            image.write(SMALL_GIF)
+        with mock.patch('posts.thumbnails.transaction.on_commit') as commit:
+            transfer.import_posts(self.jsonl(
+                {'author': 'auth', 'text': 'Копия', 'image': 'small.gif'},
+                {'author': 'auth', 'text': 'На месте',
+                 'image': os.path.join(TEMP_MEDIA_ROOT, 'posts',
+                                       'media.gif')},
+            ), images_dir=images_dir)
+        commit.assert_called_once()
+        copied = Post.objects.get(text='Копия')
+        self.assertTrue(copied.image.name.startswith('posts/small'))
+        self.assertTrue(os.path.isfile(copied.image.path))
+        self.assertEqual(Post.objects.get(text='На месте').image.name,
+                         'posts/media.gif')
+
+    def test_round_trip(self):
+        """Ошибка выгрузки и повторной загрузки постов"""
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Пост, с "кавычками"\nи переводом строки')
+        Post.objects.create(author=self.reader, text='Без группы')
+        expected = list(Post.objects.order_by('pk').values_list(
+            'author', 'group', 'text', 'pub_date'
+        ))
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                output = io.StringIO()
+                self.assertEqual(
+                    transfer.export_posts(output, fmt, chunk_size=1), 2
+                )
+                Post.objects.all().delete()
+                output.seek(0)
+                transfer.import_posts(output, fmt)
+                self.assertEqual(list(Post.objects.order_by('pk').values_list(
+                    'author', 'group', 'text', 'pub_date'
+                )), expected)
+
+    def test_commands(self):
+        """Ошибка команд import_posts и export_posts"""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write('author,group,text\nauth,testslug,Пост из CSV\n')
+        call_command('import_posts', path, stdout=io.StringIO())
+        self.assertTrue(Post.objects.filter(text='Пост из CSV').exists())
+        output = io.StringIO()
+        call_command('export_posts', '--author', 'auth', stdout=output,
+                     stderr=io.StringIO())
+        record = json.loads(output.getvalue())
+        self.assertEqual(record['text'], 'Пост из CSV')
+        self.assertEqual(record['group'], 'testslug')
+        with open(path, 'a', encoding='utf-8') as source:
+            source.write('unknown,,Пост\n')
+        with self.assertRaisesRegex(CommandError, 'Строка 3: нет автора'):
+            call_command('import_posts', path, stdout=io.StringIO())
@@ -12,6 +12,7 @@ from posts.models import Comment, Follow, Post, Group
 User = get_user_model()
 
 POSTS_OF_PAGE = settings.POSTS_OF_PAGE
+COMMENTS_OF_PAGE = settings.COMMENTS_OF_PAGE
 POST_COUNT_TEST = 13
 
 
@@ -127,6 +128,32 @@ class PostViewsTests(TestCase):
         self.assertEqual(response.context['comments'][0].text,
                          self.comment.text)
 
+    def test_comments_pages(self):
+        """Ошибка постраничного вывода комментариев"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user_2, text=f'Ещё {number}')
+            for number in range(COMMENTS_OF_PAGE)
+        ])
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=(self.post.id,)))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_OF_PAGE)
+        self.assertTrue(comments.has_next())
+        fragment = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id,))
+            + f'?after={comments.next_cursor}'
+        )
+        self.assertTemplateUsed(fragment, 'posts/includes/comments_list.html')
+        self.assertTemplateNotUsed(fragment, 'base.html')
+        self.assertEqual(list(fragment.context['comments']), [self.comment])
+        self.assertFalse(fragment.context['comments'].has_next())
+
+    def test_comments_fragment_unknown_post(self):
+        """Ошибка фрагмента комментариев несуществующего поста"""
+        response = self.client.get(reverse('posts:post_comments',
+                                           args=(self.post.id + 1,)))
+        self.assertEqual(response.status_code, 404)
+
     def test_index_cache(self):
         """Ошибка кэша главной страницы"""
         Post.objects.create(
@@ -135,12 +162,36 @@ class PostViewsTests(TestCase):
             group=self.group,
         )
         response_1 = self.client.get(reverse('posts:index'))
-        Post.objects.filter(text='Кэш').delete()
-        response_2 = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response_2 = self.client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
+        Post.objects.filter(text='Кэш').delete()
         response_3 = self.client.get(reverse('posts:index'))
         self.assertNotEqual(response_1.content, response_3.content)
+        self.assertNotIn('Кэш', response_3.content.decode())
+
+    def test_feed_cache_invalidation(self):
+        """Ошибка сброса кэша лент при изменении поста"""
+        urls = (
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый пост'
+        post.save()
+        Comment.objects.create(
+            post=self.post,
+            text='Новый комментарий',
+            author=self.user_2,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                self.assertIn('Изменённый пост', content)
+        self.assertIn('Новый комментарий', content)
 
     def test_follow(self):
         """Ошибка создания подписки"""
@@ -210,6 +261,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(posts)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client_user = Client()
         self.authorized_client_user.force_login(self.user_2)
         Follow.objects.create(user=self.user_2, author=self.user)
@@ -234,3 +286,39 @@ class PaginatorViewsTest(TestCase):
                                     (reverse(name, args=args) + page))
                         self.assertEqual(len(response.context['page_obj']),
                                          posts_in_page)
+
+    def test_cursor_paginator(self):
+        """Ошибка постраничного вывода по курсору"""
+        urls = (
+            ('posts:index', None),
+            ('posts:group_list', (self.group.slug,)),
+            ('posts:profile', (self.user,)),
+            ('posts:follow_index', None)
+        )
+        for name, args in urls:
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                first = self.authorized_client_user.get(url)
+                first_page = first.context['page_obj']
+                response = self.authorized_client_user.get(
+                    f'{url}?after={first_page.next_cursor}'
+                )
+                page = response.context['page_obj']
+                self.assertTrue(page.is_cursor)
+                self.assertEqual(len(page), POST_COUNT_TEST - POSTS_OF_PAGE)
+                self.assertFalse(page.has_next())
+                self.assertTrue(page.has_previous())
+                self.assertNotIn(page[0], list(first_page))
+                response = self.authorized_client_user.get(
+                    f'{url}?before={page.previous_cursor}'
+                )
+                self.assertEqual(list(response.context['page_obj']),
+                                 list(first_page))
+
+    def test_cursor_paginator_broken_token(self):
+        """Ошибка обработки испорченного курсора"""
+        response = self.authorized_client_user.get(
+            reverse('posts:index') + '?after=broken'
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_OF_PAGE)
+        self.assertFalse(response.context['page_obj'].has_previous())
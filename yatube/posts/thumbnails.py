@@ -0,0 +1,146 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import feed_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+POST_GEOMETRY = '960x339'
+POST_OPTIONS = {'crop': 'center', 'upscale': True}
+# Сколько секунд не ставить повторно в очередь одну и ту же картинку.
+SCHEDULE_TIMEOUT = 60
+
+_executor = None
+
+
+def thumbnail_file(name):
+    """ImageFile миниатюры поста; сама миниатюра не создаётся.
+
+    Повторяет подготовку опций из ThumbnailBackend.get_thumbnail,
+    чтобы имя файла совпало с тем, что создаст sorl.
+    """
+    backend = default.backend
+    source = ImageFile(name)
+    options = dict(POST_OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, POST_GEOMETRY, options),
+        default.storage,
+    )
+
+
+def _fetch_raw(keys):
+    """Значения хранилища sorl по ключам: кэш и БД за один запрос."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(key__in=missing)
+                     .values_list('key', 'value'))
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {key: None if value == EMPTY_VALUE else value
+            for key, value in values.items()}
+
+
+def prefetch_thumbnails(posts):
+    """Проставляет постам атрибут thumbnail одним пакетным запросом.
+
+    thumbnail -- готовая миниатюра или None, если её ещё нет;
+    недостающие миниатюры ставятся в очередь.
+    """
+    keys = {}
+    for post in posts:
+        post.thumbnail = None
+        if post.image:
+            key = add_prefix(thumbnail_file(post.image.name).key)
+            keys.setdefault(key, []).append(post)
+    if not keys:
+        return posts
+    for key, value in _fetch_raw(list(keys)).items():
+        for post in keys[key]:
+            if value:
+                post.thumbnail = deserialize_image_file(value)
+            else:
+                schedule(post.image.name)
+    return posts
+
+
+def _thumbnail_ready(name):
+    """Сбрасывает кэш лент с постами этой картинки: страницы и их ETag
+    собраны с заглушкой вместо миниатюры."""
+    feeds = {'index'}
+    for pk, author_id, group_id in Post.objects.filter(image=name).values_list(
+        'pk', 'author', 'group'
+    ):
+        feeds.update((f'post:{pk}', f'profile:{author_id}'))
+        if group_id:
+            feeds.add(f'group:{group_id}')
+    feed_cache.bump(*sorted(feeds))
+
+
+def _generate(name):
+    try:
+        get_thumbnail(name, POST_GEOMETRY, **POST_OPTIONS)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+        return
+    _thumbnail_ready(name)
+
+
+def _generate_in_worker(name):
+    try:
+        _generate(name)
+    finally:
+        close_old_connections()
+
+
+def _submit(name):
+    global _executor
+    if not settings.THUMBNAIL_WORKERS:
+        _generate(name)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+        )
+    _executor.submit(_generate_in_worker, name)
+
+
+def _submit_all(names):
+    for name in names:
+        _submit(name)
+
+
+def schedule(*names):
+    """Ставит создание миниатюр в фоновый пул после коммита; на все
+    картинки -- один обработчик on_commit."""
+    names = [name for name in names
+             if cache.add(f'thumbnail-scheduled:{name}', True,
+                          SCHEDULE_TIMEOUT)]
+    if names:
+        transaction.on_commit(lambda: _submit_all(names))
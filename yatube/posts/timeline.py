@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max, Q
+
+from .models import FeedItem, Follow, Post, UserCounters
+from .utils import bulk_insert
+
+FEED_FANOUT_LIMIT = settings.FEED_FANOUT_LIMIT
+FEED_KEYS = ('feed_date', 'feed_post')
+
+
+def _feed_items(user_id, posts):
+    return (FeedItem(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts)
+
+
+def _popular_authors(user):
+    """Авторы из подписок пользователя, чьи посты не раскладываются."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers_count__gt=FEED_FANOUT_LIMIT,
+        ).values_list('author', flat=True)
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Посты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT,
+    не раскладываются: читатели подтягивают их сами в pull_popular.
+    """
+    if UserCounters.objects.filter(
+        user=post.author_id, followers_count__gt=FEED_FANOUT_LIMIT,
+    ).exists():
+        return
+    followers = Follow.objects.filter(author=post.author_id)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.values_list('user', flat=True)),
+        ignore_conflicts=True,
+    )
+
+
+def add_authors(user_id, author_ids):
+    """Добавляет в ленту пользователя все посты новых авторов."""
+    posts = (Post.objects.filter(author__in=author_ids)
+             .values_list('pk', 'pub_date').iterator())
+    bulk_insert(FeedItem.objects, _feed_items(user_id, posts),
+                ignore_conflicts=True)
+
+
+def fill_timeline(after_id=0):
+    """Раскладывает посты с id больше after_id одним INSERT ... SELECT.
+
+    Для засева и импорта, которые пишут посты через bulk_create мимо
+    сигналов. Как и fan_out_post, пропускает посты авторов, у которых
+    подписчиков больше FEED_FANOUT_LIMIT: их подтянет pull_popular.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedItem._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            'ON post.author_id = follow.author_id '
+            'WHERE post.id > %s AND NOT EXISTS ('
+            f'SELECT 1 FROM {UserCounters._meta.db_table} counters '
+            'WHERE counters.user_id = post.author_id '
+            'AND counters.followers_count > %s)',
+            [after_id, FEED_FANOUT_LIMIT],
+        )
+
+
+def remove_authors(user_id, author_ids):
+    """Убирает из ленты пользователя посты авторов."""
+    FeedItem.objects.filter(user=user_id,
+                            post__author__in=author_ids).delete()
+
+
+def pull_popular(user):
+    """Подтягивает в ленту новые посты популярных авторов.
+
+    Отметка -- последний подтянутый пост каждого автора: с общей
+    отметкой запоздавший пост одного автора терялся бы за более свежим
+    постом другого. Вызывается при промахе кэша ленты подписок (её
+    версия зависит от главной, которая меняется с каждым постом).
+    """
+    authors = _popular_authors(user)
+    if not authors:
+        return
+    since = dict(
+        FeedItem.objects.filter(user=user, post__author__in=authors)
+        .order_by().values('post__author').annotate(since=Max('pub_date'))
+        .values_list('post__author', 'since')
+    )
+    new_posts = Q(author__in=[author_id for author_id in authors
+                              if author_id not in since])
+    for author_id, pub_date in since.items():
+        # Посты с той же секундой уже могут быть в ленте: их повторная
+        # вставка пропускается по уникальности.
+        new_posts |= Q(author=author_id, pub_date__gte=pub_date)
+    FeedItem.objects.bulk_create(
+        _feed_items(user.pk, Post.objects.filter(new_posts)
+                    .values_list('pk', 'pub_date').iterator()),
+        ignore_conflicts=True,
+    )
+
+
+def feed_posts(user):
+    """Посты ленты подписок с ключами сортировки FEED_KEYS.
+
+    Ключи берутся из записи ленты, чтобы запрос шёл по её индексу.
+    Новые посты популярных авторов сюда не попадают, пока не вызван
+    pull_popular.
+    """
+    return Post.objects.filter(timeline__user=user).annotate(
+        feed_date=F('timeline__pub_date'),
+        feed_post=F('timeline__post'),
+    )
+
+
+def feed_size(user):
+    """Число постов в ленте; COUNT(*) по feed_posts сгруппировал бы строки."""
+    return FeedItem.objects.filter(user=user).count()
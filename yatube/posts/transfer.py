@@ -0,0 +1,255 @@
+"""Импорт и экспорт постов потоком строк JSONL или CSV.
+
+Импорт пишет посты пакетами через bulk_create мимо сигналов, поэтому
+ленты подписок, счётчики, поисковый индекс, миниатюры и версии лент
+догоняются после загрузки одним проходом по новым постам. Экспорт
+читает посты через .iterator(chunk_size), и память не растёт с числом
+строк.
+"""
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Case, Count, Max, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed_cache, search, thumbnails, timeline
+from .models import Group, Post
+from .utils import bulk_insert
+
+User = get_user_model()
+
+FORMATS = ('jsonl', 'csv')
+# id выгружается для справки; при импорте посты получают новые id.
+FIELDS = ('id', 'author', 'group', 'text', 'pub_date', 'image')
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+
+class TransferError(Exception):
+    pass
+
+
+def format_for(path):
+    """Формат файла по расширению: .csv или JSONL."""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _record(row):
+    pk, author, group, text, pub_date, image = row
+    return {
+        'id': pk,
+        'author': author,
+        'group': group,
+        'text': text,
+        'pub_date': pub_date.isoformat(),
+        'image': image or None,
+    }
+
+
+def export_posts(output, fmt='jsonl', posts=None,
+                 chunk_size=EXPORT_CHUNK_SIZE):
+    """Пишет посты в output и возвращает их число."""
+    if posts is None:
+        posts = Post.objects.all()
+    rows = posts.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, FIELDS)
+        writer.writeheader()
+
+        def write(record):
+            writer.writerow({name: '' if value is None else value
+                             for name, value in record.items()})
+    else:
+        def write(record):
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+    total = 0
+    for row in rows.iterator(chunk_size=chunk_size):
+        write(_record(row))
+        total += 1
+    return total
+
+
+def read_records(source, fmt='jsonl'):
+    """Пары (номер строки, запись) из JSONL или CSV."""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise TransferError(f'Строка {number}: {error}') from None
+        if not isinstance(record, dict):
+            raise TransferError(f'Строка {number}: ожидается объект JSON')
+        yield number, record
+
+
+class Importer:
+    """Собирает посты из записей.
+
+    Авторы и группы ищутся в словарях, загруженных один раз; при
+    create_missing недостающие создаются и попадают туда же.
+    Изображение -- путь к файлу относительно images_dir: файлы внутри
+    MEDIA_ROOT остаются на месте, остальные копируются в хранилище.
+    """
+
+    def __init__(self, images_dir=None, create_missing=False):
+        self.images_dir = images_dir or settings.MEDIA_ROOT
+        self.create_missing = create_missing
+        self.authors = dict(
+            User.objects.values_list('username', 'pk').iterator()
+        )
+        self.groups = dict(Group.objects.values_list('slug', 'pk').iterator())
+
+    def author_id(self, username):
+        if not username:
+            raise TransferError('не указан автор')
+        if username not in self.authors:
+            if not self.create_missing:
+                raise TransferError(f'нет автора {username}')
+            self.authors[username] = User.objects.create_user(username).pk
+        return self.authors[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            if not self.create_missing:
+                raise TransferError(f'нет группы {slug}')
+            self.groups[slug] = Group.objects.create(
+                title=slug, slug=slug, description=''
+            ).pk
+        return self.groups[slug]
+
+    def pub_date(self, value):
+        if not value:
+            return timezone.now()
+        try:
+            pub_date = parse_datetime(value)
+        except ValueError:
+            pub_date = None
+        if pub_date is None:
+            raise TransferError(f'неверная дата {value}')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return pub_date
+
+    def image(self, path):
+        if not path:
+            return ''
+        source = os.path.abspath(os.path.join(self.images_dir, path))
+        if not os.path.isfile(source):
+            raise TransferError(f'нет файла {source}')
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        if source.startswith(media_root + os.sep):
+            return os.path.relpath(source, media_root)
+        upload_to = Post._meta.get_field('image').upload_to
+        with open(source, 'rb') as image:
+            return default_storage.save(
+                upload_to + os.path.basename(source), File(image)
+            )
+
+    def post(self, record):
+        if not record.get('text'):
+            raise TransferError('пустой текст')
+        return Post(
+            text=record['text'],
+            author_id=self.author_id(record.get('author')),
+            group_id=self.group_id(record.get('group')),
+            pub_date=self.pub_date(record.get('pub_date')),
+            image=self.image(record.get('image')),
+        )
+
+
+def _insert(posts):
+    """Пишет пакет постов через bulk_create с датами из файла.
+
+    pre_save в bulk_create ставит в pub_date по auto_now_add текущее
+    время, поэтому даты запоминаются до записи и возвращаются одним
+    UPDATE ... CASE на пачку id.
+    """
+    if not posts:
+        return
+    dates = [post.pub_date for post in posts]
+    last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    bulk_insert(Post.objects, posts)
+    # SQLite не возвращает id из bulk_create, а посты одного INSERT
+    # получают id подряд в порядке строк.
+    ids = list(Post.objects.filter(pk__gt=last_id).order_by('pk')
+               .values_list('pk', flat=True))
+    date_field = Post._meta.get_field('pub_date')
+    # На пост три параметра: id в IN и в WHEN, дата в THEN.
+    size = connection.ops.bulk_batch_size([date_field] * 3, ids)
+    for start in range(0, len(ids), size):
+        chunk = zip(ids[start:start + size], dates[start:start + size])
+        whens = [When(pk=pk, then=Value(date, output_field=date_field))
+                 for pk, date in chunk]
+        Post.objects.filter(pk__in=ids[start:start + size]).update(
+            pub_date=Case(*whens, output_field=date_field),
+        )
+
+
+def _catch_up(last_id):
+    """Делает для постов с id больше last_id то, что делают сигналы.
+
+    Пока идёт импорт, посты не должны создаваться иначе: их счётчики
+    и ленты учлись бы дважды.
+    """
+    posts = Post.objects.filter(pk__gt=last_id).order_by()
+    timeline.fill_timeline(last_id)
+    authors = list(posts.values_list('author').annotate(total=Count('pk')))
+    for author_id, total in authors:
+        counters.change_user(author_id, posts_count=total)
+    groups = list(posts.filter(group__isnull=False).values_list(
+        'group'
+    ).annotate(total=Count('pk')))
+    for group_id, total in groups:
+        counters.change_group(group_id, total)
+    search.index_posts(posts.values_list('pk', 'text').iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ))
+    images = posts.exclude(image='').values_list('image', flat=True)
+    thumbnails.schedule(*images.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    # Ленты подписок зависят от версии главной и сбросятся вместе с ней.
+    feed_cache.bump(
+        'index',
+        *(f'profile:{author_id}' for author_id, _ in authors),
+        *(f'group:{group_id}' for group_id, _ in groups),
+    )
+
+
+def import_posts(source, fmt='jsonl', batch_size=IMPORT_BATCH_SIZE,
+                 images_dir=None, create_missing=False):
+    """Загружает посты из source одной транзакцией и возвращает их
+    число; при ошибке в записи не загружается ничего."""
+    total = 0
+    with transaction.atomic():
+        importer = Importer(images_dir, create_missing)
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        batch = []
+        for number, record in read_records(source, fmt):
+            try:
+                batch.append(importer.post(record))
+            except TransferError as error:
+                raise TransferError(f'Строка {number}: {error}') from None
+            if len(batch) == batch_size:
+                _insert(batch)
+                total += len(batch)
+                batch = []
+        _insert(batch)
+        total += len(batch)
+        _catch_up(last_id)
+    return total
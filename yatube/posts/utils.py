@@ -1,10 +1,207 @@
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.translation import gettext_lazy as _
 
 POSTS_OF_PAGE = settings.POSTS_OF_PAGE
+CURSOR_KEYS = ('pub_date', 'pk')
+# Сколько номеров страниц показывать по обе стороны от текущей.
+PAGE_WINDOW = 2
 
 
-def page_context(request, post_list):
-    paginator = Paginator(post_list, POSTS_OF_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def encode_cursor(obj, keys=CURSOR_KEYS):
+    """Непрозрачный токен позиции записи в ленте."""
+    date_key, pk_key = keys
+    value = f'{getattr(obj, date_key).isoformat()}|{getattr(obj, pk_key)}'
+    return urlsafe_base64_encode(force_bytes(value))
+
+
+def decode_cursor(token):
+    """Разбирает токен в пару (дата, id); None, если токен испорчен."""
+    try:
+        date, pk = urlsafe_base64_decode(token).decode().split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, открытая по курсору, без номера и общего числа."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод поиском по ключу (дата, id).
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница читается
+    диапазонным запросом от позиции, записанной в токене.
+    """
+
+    def __init__(self, object_list, per_page, keys=CURSOR_KEYS):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+
+    def _seek(self, cursor, lookup):
+        date_key, pk_key = self.keys
+        date, pk = cursor
+        return (Q(**{f'{date_key}__{lookup}': date})
+                | Q(**{date_key: date, f'{pk_key}__{lookup}': pk}))
+
+    def get_cursor_page(self, after=None, before=None):
+        date_key, pk_key = self.keys
+        limit = self.per_page + 1
+        cursor = decode_cursor(before) if before else None
+        if cursor:
+            posts = list(
+                self.object_list.filter(self._seek(cursor, 'gt'))
+                .order_by(date_key, pk_key)[:limit]
+            )
+            has_previous = len(posts) > self.per_page
+            posts = posts[:self.per_page][::-1]
+            return CursorPage(posts, self, True, has_previous)
+        cursor = decode_cursor(after) if after else None
+        posts = self.object_list.order_by(f'-{date_key}', f'-{pk_key}')
+        if cursor:
+            posts = posts.filter(self._seek(cursor, 'lt'))
+        posts = list(posts[:limit])
+        return CursorPage(posts[:self.per_page], self,
+                          len(posts) > self.per_page, cursor is not None)
+
+
+class WindowPaginator(Paginator):
+    """Постраничный вывод по номерам без точного COUNT(*).
+
+    count -- функция, которая оценивает число записей дешевле
+    object_list.count(): счётчик или закэшированное значение. Оценка
+    нужна только для окна номеров page.page_window, которое шаблон
+    выводит вместо page_range; есть ли следующая страница,
+    решает лишняя запись, прочитанная вместе со страницей, так что
+    отставшая оценка не прячет посты и не обрывает ленту.
+    """
+
+    def __init__(self, object_list, per_page, count=None,
+                 window=PAGE_WINDOW):
+        super().__init__(object_list, per_page)
+        self.window_size = window
+        if count is not None:
+            self.count = count()
+
+    def _set_count(self, count=None):
+        """Поправляет оценку; без аргумента -- точный подсчёт."""
+        self.__dict__.pop('num_pages', None)
+        if count is None:
+            self.__dict__.pop('count', None)
+        else:
+            self.count = count
+
+    def validate_number(self, number):
+        # Верхнюю границу проверяет page(): оценка могла отстать.
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        seen = bottom + min(len(object_list), self.per_page)
+        if len(object_list) <= self.per_page:
+            self._set_count(seen)
+        elif self.count <= seen:
+            self._set_count(seen + 1)
+        page = self._get_page(object_list[:self.per_page], number, self)
+        page.page_window = self.window(number)
+        return page
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            # За концом ленты: последняя страница по точному числу.
+            self._set_count()
+            return self.page(self.num_pages)
+
+    def window(self, number):
+        """Номера первой, последней и соседних с number страниц;
+        None -- пропуск между ними."""
+        last = self.num_pages
+        numbers = {1, last, *range(max(1, number - self.window_size),
+                                   min(last, number + self.window_size) + 1)}
+        window = []
+        previous = 0
+        for current in sorted(numbers):
+            if current - previous > 1:
+                window.append(None)
+            window.append(current)
+            previous = current
+        return window
+
+
+def _attach_cursors(page, keys):
+    page.next_cursor = page.previous_cursor = None
+    if len(page):
+        page.next_cursor = encode_cursor(page[-1], keys)
+        page.previous_cursor = encode_cursor(page[0], keys)
+    return page
+
+
+def page_context(request, post_list, keys=CURSOR_KEYS,
+                 per_page=POSTS_OF_PAGE, cursor_only=False, count=None):
+    """Страница ленты по ?page= или по курсорам ?after= / ?before=.
+
+    При cursor_only=True ?page= не учитывается: первая страница тоже
+    читается по курсору, без COUNT(*). count -- функция, которая
+    оценивает число записей дешевле, чем post_list.count().
+    """
+    date_key, pk_key = keys
+    post_list = post_list.order_by(f'-{date_key}', f'-{pk_key}')
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before or cursor_only:
+        paginator = CursorPaginator(post_list, per_page, keys)
+        return _attach_cursors(
+            paginator.get_cursor_page(after, before), keys
+        )
+    paginator = WindowPaginator(post_list, per_page, count)
+    return _attach_cursors(paginator.get_page(request.GET.get('page')), keys)
+
+
+def bulk_insert(manager, objs, **kwargs):
+    """bulk_create для потока объектов без явного batch_size.
+
+    Размер пачки выбирает Django по пределам базы: SQLite не примет
+    больше 500 строк в одном INSERT ... SELECT UNION ALL, а явный
+    batch_size Django 2.2 этим пределом не ограничивает.
+    """
+    return manager.bulk_create(objs, **kwargs)
@@ -1,56 +1,104 @@
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
-
+from django.utils.http import urlencode
+
+from .counters import user_counters
+from .feed_cache import cache_control, conditional
+from .feeds import (comments_page, feeds_for_group, feeds_for_post,
+                    feeds_for_profile, feeds_for_viewer, follow_page,
+                    get_post, group_page, index_feeds, index_page,
+                    profile_page, who_to_follow)
+from .follow_graph import graph
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import page_context
+from .page_cache import render_page
+from .search import search_posts
+from .thumbnails import prefetch_thumbnails
+from .utils import POSTS_OF_PAGE, WindowPaginator
 
 
+@cache_control
+@conditional(lambda request: index_feeds())
 def index(request):
-    context = {
-        'page_obj':
-        page_context(request, Post.objects.select_related('author', 'group')
-                     .all()),
-    }
-    return render(request, 'posts/index.html', context)
+    return render_page(request, 'posts/index.html', lambda: {
+        'page_obj': index_page(request),
+    })
 
 
+@cache_control
+@conditional(feeds_for_group)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    context = {
+    return render_page(request, 'posts/group_list.html', lambda: {
         'group': group,
-        'page_obj':
-        page_context(request, group.posts.select_related('author')
-                     .all()),
-    }
-    return render(request, 'posts/group_list.html', context)
+        'page_obj': group_page(request, group),
+    })
 
 
+@cache_control
+@conditional(feeds_for_profile, personal_feeds=feeds_for_viewer)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = author.following.filter(
-        user=request.user.id,
-    ).exists() and request.user.is_authenticated
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    user_counters(author)
+    following = (request.user.is_authenticated
+                 and graph.is_following(request.user.pk, author.pk))
     context = {
         'author': author,
-        'page_obj':
-        page_context(request, author.posts.select_related('group')
-                     .all()),
         'following': following,
+        'recommendations': who_to_follow(request.user, (author.pk,)),
     }
-    return render(request, 'posts/profile.html', context)
+    return render_page(request, 'posts/profile.html', lambda: {
+        'author': author,
+        'page_obj': profile_page(request, author),
+    }, context)
 
 
+@cache_control
+@conditional(feeds_for_post)
 def post_detail(request, post_id):
-    post_detail = get_object_or_404(Post.objects.prefetch_related
-                                    ('comments__author'), pk=post_id)
-    form = CommentForm()
+    author_id = get_object_or_404(
+        Post.objects.values_list('author', flat=True), pk=post_id
+    )
     context = {
-        'post': post_detail,
-        'comments': post_detail.comments.all(),
-        'form': form
+        'post_id': post_id,
+        'author_id': author_id,
+        'form': CommentForm(),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return render_page(request, 'posts/post_detail.html', lambda: {
+        'post': get_post(post_id),
+        'comments': comments_page(request, post_id),
+    }, context)
+
+
+def post_comments(request, post_id):
+    comments = comments_page(request, post_id)
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = WindowPaginator(search_posts(query) if query else [],
+                               POSTS_OF_PAGE).get_page(request.GET.get('page'))
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        page_obj.object_list
+    )
+    page_obj.object_list = [posts[pk] for pk in page_obj.object_list
+                            if pk in posts]
+    context = {
+        'query': query,
+        'page_obj': prefetch_thumbnails(page_obj),
+        'page_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
@@ -97,11 +145,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related('author', 'group').filter(
-        author__following__user=request.user
-    )
     context = {
-        'page_obj': page_context(request, post_list),
+        'page_obj': follow_page(request),
+        'recommendations': who_to_follow(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -117,5 +163,6 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(Follow, author__username=username).delete()
+    get_object_or_404(Follow, user=request.user,
+                      author__username=username).delete()
     return redirect('posts:profile', username=username)
@@ -29,7 +29,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -40,14 +42,32 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'core.testing.TestRunner'
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Шаблоны компилируются один раз на процесс и больше не читаются
+# с диска. Django и так кэширует их при DEBUG = False; True включает
+# кэш и при DEBUG = True, например для замеров под runserver:
+# TEMPLATE_CACHE=1 в окружении.
+TEMPLATE_CACHE: bool = os.environ.get('TEMPLATE_CACHE', '') == '1'
+
+TEMPLATE_OPTIONS = {}
+if TEMPLATE_CACHE:
+    TEMPLATE_OPTIONS['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
+        'APP_DIRS': not TEMPLATE_CACHE,
         'OPTIONS': {
+            **TEMPLATE_OPTIONS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -102,6 +122,34 @@ STATIC_URL = '/static/'
 
 POSTS_OF_PAGE: int = 10
 
+COMMENTS_OF_PAGE: int = 20
+
+FEED_FANOUT_LIMIT: int = 1000
+
+# Граф подписок в памяти (posts.follow_graph): сколько секунд вне
+# запросов верить загруженным подпискам и скольких пользователей держать.
+FOLLOW_GRAPH_TTL: int = 60
+FOLLOW_GRAPH_MAX_USERS: int = 100000
+
+# Сколько рекомендаций «на кого подписаться» хранить на пользователя
+# (пересчитывает recommend_authors) и сколько показывать.
+RECOMMENDATIONS_COUNT: int = 20
+RECOMMENDATIONS_SHOWN: int = 5
+
+FEED_CACHE_TIMEOUT: int = 60 * 60
+
+# Сколько секунд прокси может отдавать анонимам страницу лент без проверки.
+ANONYMOUS_MAX_AGE: int = 60
+
+# Сколько секунд число постов ленты берётся из кэша, а не COUNT(*).
+COUNT_CACHE_TIMEOUT: int = 5 * 60
+
+# HTML карточки поста живёт в кэше, пока пост не изменится; срок
+# ограничивает только устаревание имени автора и названия группы.
+CARD_CACHE_TIMEOUT: int = 24 * 60 * 60
+
+SEARCH_RESULTS_LIMIT: int = 500
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -113,6 +161,33 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Потоки фоновой генерации миниатюр; 0 -- создавать сразу.
+THUMBNAIL_WORKERS: int = 2
+
+# Выполнять фоновые задачи сразу при постановке в очередь. Включается
+# в тестах (core.testing.TestRunner); без него задачи выполняет
+# manage.py run_tasks.
+TASKS_EAGER: bool = os.environ.get('TASKS_EAGER', '') == '1'
+TASKS_BATCH_SIZE: int = 100
+TASKS_POLL_INTERVAL: float = 1.0
+TASKS_MAX_ATTEMPTS: int = 5
+# Пауза перед повтором, секунд; удваивается с каждой попыткой.
+TASKS_RETRY_DELAY: int = 10
+# Через сколько секунд задача упавшего исполнителя снова в очереди.
+TASKS_LOCK_TIMEOUT: int = 10 * 60
+
+# Доля профилируемых запросов; 0 -- middleware отключается.
+PROFILING_SAMPLE_RATE: float = 0.0
+PROFILING_FLUSH_INTERVAL: int = 60
+# Файл для строк JSON со сводкой; None -- писать в лог core.profiling.
+PROFILING_FILE = None
+# Сколько одинаковых запросов за запрос считать N+1.
+PROFILING_DUPLICATE_THRESHOLD: int = 3
+
+# Для нескольких процессов на одной машине без Redis:
+# 'BACKEND': 'core.cache.SQLiteCache',
+# 'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+# 'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 1024 * 1024},
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',